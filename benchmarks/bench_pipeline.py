@@ -0,0 +1,236 @@
+"""Scaling benchmarks for the San Francisco housing pipeline.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py                                  # 1x, 100x, 10,000x
+    python benchmarks/bench_pipeline.py --scales 1,100,10000,1000000     # full sweep (~20 GB CSV at 1,000,000x)
+    python benchmarks/bench_pipeline.py --baseline benchmarks/results/previous.json
+
+Synthetic census data is generated at each scale (multiples of the 397 row
+sample) and every stage of ``san_francisco_housing.py`` is timed, both as the
+notebook originally wrote it ("notebook" stages) and as the ``sfo_housing``
+package implements it ("package" stages).  Scales too large for memory only
+run the streaming stages.  Results are written as JSON so runs can be compared.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Allow running as `python benchmarks/bench_pipeline.py` from the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sfo_housing import analysis  # noqa: E402
+from sfo_housing.cube import AggregationCube  # noqa: E402
+from sfo_housing.loader import read_census_csv  # noqa: E402
+from sfo_housing.streaming import ingest_census_file  # noqa: E402
+from sfo_housing.synthetic import generate_coordinates, synthetic_shape, write_census_csv  # noqa: E402
+
+DEFAULT_SCALES = [1, 100, 10_000]
+DEFAULT_RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Above this many rows only the streaming (out-of-core) stages are run
+DEFAULT_MAX_IN_MEMORY_ROWS = 50_000_000
+
+
+def _timed(function, repeat):
+    """Best wall time of ``repeat`` runs, plus the last return value."""
+    best = float("inf")
+    value = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        best = min(best, time.perf_counter() - start)
+    return best, value
+
+
+# Notebook stages: the code exactly as san_francisco_housing.py originally ran it
+
+def notebook_load_dropna(context):
+    sfo_data_df = pd.read_csv(context["census_path"])
+    sfo_data_df.isna().sum().sum()
+    return sfo_data_df.dropna()
+
+
+def notebook_year_groupbys(context):
+    sfo_data_df = context["notebook_df"]
+    housing_units_by_year = sfo_data_df[["year", "housing_units"]].set_index("year").groupby("year").mean()
+    sfo_data_iyear_mean_df = sfo_data_df.set_index("year").groupby("year").mean(numeric_only=True)
+    return housing_units_by_year, sfo_data_iyear_mean_df
+
+
+def notebook_neighborhood_year_groupby(context):
+    return context["notebook_df"].groupby(["neighborhood", "year"]).mean()
+
+
+def notebook_location_join(context):
+    all_neighborhood_info_df = context["notebook_df"].groupby(["neighborhood"]).mean()
+    all_neighborhoods_df = pd.concat(
+        [context["coordinates_df"], all_neighborhood_info_df], axis="columns", sort=False
+    )
+    all_neighborhoods_df = all_neighborhoods_df.reset_index().dropna()
+    return all_neighborhoods_df.rename(columns={"index": "Neighborhood"})
+
+
+def notebook_idxmax(context):
+    all_neighborhoods_df = context["all_neighborhoods_df"]
+    return (
+        all_neighborhoods_df.loc[all_neighborhoods_df["gross_rent"].idxmax()],
+        all_neighborhoods_df.loc[all_neighborhoods_df["sale_price_sqr_foot"].idxmax()],
+    )
+
+
+def notebook_plot_construction(context):
+    import hvplot.pandas  # noqa: F401
+
+    context["notebook_year_dfs"][0].hvplot.bar()
+    context["notebook_neighborhood_year_df"].hvplot.line(groupby="neighborhood")
+    return context["all_neighborhoods_df"].hvplot.points("Lon", "Lat", geo=True)
+
+
+# Package stages: the sfo_housing implementation of the same work
+
+def package_typed_load(context):
+    return analysis.clean(read_census_csv(context["census_path"]))[1]
+
+
+def package_cube_build(context):
+    return AggregationCube.from_frame(context["package_df"])
+
+
+def package_rollups(context):
+    cube = context["cube"]
+    return analysis.year_rollups(cube), analysis.neighborhood_rollups(cube)
+
+
+def package_location_join(context):
+    return analysis.join_locations(context["coordinates_df"], context["cube"].neighborhood_mean()).joined_df
+
+
+def package_streaming_ingest(context):
+    return ingest_census_file(context["census_path"], chunksize=context["chunksize"])
+
+
+def _plotting_available():
+    try:
+        import hvplot  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_scale(scale, workdir, repeat, max_in_memory_rows, chunksize, progress=print):
+    """Generate data for ``scale`` and time every stage that fits; return result records."""
+    rows, neighborhoods = synthetic_shape(scale)
+    census_path = Path(workdir) / f"census_{scale}x.csv"
+
+    start = time.perf_counter()
+    write_census_csv(census_path, scale)
+    progress(f"scale {scale}x: generated {rows:,} rows / {neighborhoods:,} neighborhoods in {time.perf_counter() - start:0.1f} s")
+
+    context = {
+        "census_path": census_path,
+        "coordinates_df": generate_coordinates(scale).set_index("Neighborhood"),
+        "chunksize": chunksize,
+    }
+    records = []
+
+    def measure(name, function, store_as=None, stage_repeat=repeat):
+        seconds, value = _timed(lambda: function(context), stage_repeat)
+        if store_as:
+            context[store_as] = value
+        records.append({
+            "scale": scale,
+            "rows": rows,
+            "neighborhoods": neighborhoods,
+            "stage": name,
+            "seconds": seconds,
+            "rows_per_second": rows / seconds if seconds else None,
+        })
+        progress(f"  {name:<40} {seconds:10.4f} s")
+
+    if rows <= max_in_memory_rows:
+        measure("notebook.load_dropna", notebook_load_dropna, "notebook_df")
+        measure("notebook.year_groupbys", notebook_year_groupbys, "notebook_year_dfs")
+        measure("notebook.neighborhood_year_groupby", notebook_neighborhood_year_groupby, "notebook_neighborhood_year_df")
+        measure("notebook.location_join", notebook_location_join, "all_neighborhoods_df")
+        measure("notebook.idxmax", notebook_idxmax)
+        if _plotting_available():
+            measure("notebook.plot_construction", notebook_plot_construction, stage_repeat=1)
+
+        measure("package.typed_load_dropna", package_typed_load, "package_df")
+        measure("package.cube_build", package_cube_build, "cube")
+        measure("package.rollups", package_rollups)
+        measure("package.location_join", package_location_join)
+        # Release the in-memory frames before the streaming run
+        for key in ["notebook_df", "notebook_year_dfs", "notebook_neighborhood_year_df", "all_neighborhoods_df", "package_df", "cube"]:
+            context.pop(key, None)
+
+    # Out-of-core ingestion runs at every scale; one pass is plenty at large sizes
+    measure("package.streaming_ingest", package_streaming_ingest, stage_repeat=1 if rows > max_in_memory_rows else repeat)
+    census_path.unlink()
+    return records
+
+
+def compare(current, baseline):
+    """Print the speed ratio of each (scale, stage) against a previous results file."""
+    previous = {(record["scale"], record["stage"]): record["seconds"] for record in baseline["results"]}
+    print(f"\n{'scale':>10}  {'stage':<40} {'baseline s':>12} {'current s':>12} {'speedup':>8}")
+    for record in current["results"]:
+        key = (record["scale"], record["stage"])
+        if key not in previous:
+            continue
+        speedup = previous[key] / record["seconds"] if record["seconds"] else float("nan")
+        print(f"{record['scale']:>10}  {record['stage']:<40} {previous[key]:12.4f} {record['seconds']:12.4f} {speedup:8.2f}x")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each pipeline stage at several data scales.")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="comma separated multiples of the 397 row sample")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage (best time is kept)")
+    parser.add_argument("--max-in-memory-rows", type=int, default=DEFAULT_MAX_IN_MEMORY_ROWS,
+                        help="larger scales only run the streaming stages")
+    parser.add_argument("--chunksize", type=int, default=1_000_000, help="rows per chunk for streaming ingest")
+    parser.add_argument("--workdir", type=Path, default=None, help="where to write the synthetic CSVs")
+    parser.add_argument("--output", type=Path, default=None, help="results JSON (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=None, help="previous results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    started = datetime.now(timezone.utc)
+
+    with tempfile.TemporaryDirectory(dir=args.workdir) as workdir:
+        results = []
+        for scale in scales:
+            results.extend(run_scale(scale, workdir, args.repeat, args.max_in_memory_rows, args.chunksize))
+
+    report = {
+        "started": started.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "repeat": args.repeat,
+        "results": results,
+    }
+
+    output = args.output or DEFAULT_RESULTS_DIR / f"{started.strftime('%Y%m%dT%H%M%SZ')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+    if args.baseline:
+        compare(report, json.loads(args.baseline.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -127,6 +127,21 @@
 import pandas as pd
 import hvplot.pandas
 from pathlib import Path
+from sfo_housing import load_census_data
+from sfo_housing.column_stats import collect_stats
+from sfo_housing.cube import AggregationCube
+from sfo_housing.instrument import StageProfiler
+from sfo_housing.neighborhoods import NeighborhoodDictionary, join_by_id, unmatched_report
+from sfo_housing.plots import housing_units_ylim
+from sfo_housing.series_store import NeighborhoodSeriesStore, neighborhood_line_plot
+
+# Each analysis stage below runs inside profiler.stage(...), which records wall/CPU time,
+# peak RSS, tracemalloc deltas and rows/bytes in and out; the last cell writes a Chrome trace.
+# The display() calls stay outside the stages so rendering is not counted as analysis time.
+profiler = StageProfiler()
+
+# Long frames are displayed as their first and last rows only, not rendered in full
+pd.set_option("display.max_rows", 20)
 
 
 # ## Import the data 
@@ -134,22 +149,47 @@ from pathlib import Path
 # In[ ]:
 
 
-# Using the read_csv function and Path module, create a DataFrame 
+# Using the typed loader and Path module, create a DataFrame 
 # by importing the sfo_neighborhoods_census_data.csv file from the Resources folder
-sfo_data_df = pd.read_csv(
-    Path('./Resources/sfo_neighborhoods_census_data.csv')
-)
+# (neighborhood is stored as a categorical, year as int16 and the metrics as float32;
+#  a snapshot is cached under Resources/.cache and reused until the CSV changes)
+with profiler.stage("ingest") as stage:
+    sfo_data_df = load_census_data(
+        Path('./Resources/sfo_neighborhoods_census_data.csv')
+    )
+
+    # One pass over the rows records null counts, min/max and sums per column;
+    # the NaN audit and the dropna decision below read them instead of rescanning
+    sfo_data_stats = collect_stats(sfo_data_df)
+    stage.output(sfo_data_df)
+display("sfo_data_stats:", sfo_data_stats.columns)
 
 # For refrence only, check how many NaN entries are in dataframe
-display("Number of Nan entries = ", sfo_data_df.isna().sum().sum())   # isna() returns True/False for every entry, first .sum() returns sum for every column, second .sum() returns sum across columns
+display("Number of Nan entries = ", sfo_data_stats.nan_entries)
 
-# Drop Nan entries
-sfo_data_df.dropna(inplace=True)
+# Drop Nan entries (only rescans the rows when the statistics saw a NaN)
+with profiler.stage("nan_audit") as stage:
+    stage.input(sfo_data_df)
+    if sfo_data_stats.rows_with_nulls:
+        sfo_data_df.dropna(inplace=True)
+    stage.output(sfo_data_df)
 
 # Review the first and last five rows of the DataFrame
 display("sfo_data_df head:", sfo_data_df.head())
 display("sfo_data_df tail:", sfo_data_df.tail())
 
+# Aggregate the sums and counts per (neighborhood, year) in a single pass over the rows.
+# Every by-year / by-neighborhood mean below is derived from this cube instead of another groupby.
+# Neighborhood names are normalized (whitespace, case) through a shared dictionary first, so
+# spellings like "Bernal Heights " fall into one cell under a tidy "Bernal Heights" label.
+with profiler.stage("aggregate") as stage:
+    stage.input(sfo_data_df)
+    neighborhood_dictionary = NeighborhoodDictionary()
+    sfo_data_cube = AggregationCube.from_frame(sfo_data_df, dictionary=neighborhood_dictionary)
+    # One output "row" per (neighborhood, year) cell
+    stage.rows_out = int(sfo_data_cube.rows.size)
+    stage.bytes_out = int(sfo_data_cube.sums.nbytes + sfo_data_cube.counts.nbytes + sfo_data_cube.rows.nbytes)
+
 
 # ---
 
@@ -180,15 +220,10 @@ display("sfo_data_df tail:", sfo_data_df.tail())
 
 # Create a numerical aggregation that groups the data by the year and then averages the results.
 
-# Filter out and create a new dataframe with year, housing units
-housing_units = sfo_data_df[["year", "housing_units"]]
-display("housing_units:", housing_units.head())
-
-# Set the 'year' as the index
-housing_units = housing_units.set_index('year')
-display("housing_units:", housing_units.head())
-
-housing_units_by_year = housing_units.groupby("year").mean()
+# Average housing units per year, derived from the (neighborhood, year) cube
+with profiler.stage("housing_units_by_year") as stage:
+    housing_units_by_year = sfo_data_cube.year_mean(["housing_units"])
+    stage.output(housing_units_by_year)
 display("housing_units_by_year:", housing_units_by_year)
 
 
@@ -200,9 +235,8 @@ display("housing_units_by_year:", housing_units_by_year)
 
 
 # For the bar plot, set the y axis "range" at 25% (of the max/min) below the min value and 25% above the max value
-bar_range_housing_unit = (max(housing_units_by_year["housing_units"]) - min(housing_units_by_year["housing_units"])) * 0.25
-ylim_lo = min(housing_units_by_year["housing_units"]) - bar_range_housing_unit
-ylim_hi = max(housing_units_by_year["housing_units"]) + bar_range_housing_unit
+# (vectorized min/max of the yearly averages, shared with the headless and batch charts)
+ylim_lo, ylim_hi = housing_units_ylim(housing_units_by_year)
 
 # Create a visual aggregation explore the housing units by year
 housing_units_by_year.hvplot.bar(
@@ -256,14 +290,13 @@ housing_units_by_year.hvplot.bar(
 # In[ ]:
 
 
-# Set the 'year' as the index
-sfo_data_iyear_df = sfo_data_df.set_index('year')
-display("sfo_data_iyear_df:", sfo_data_iyear_df.head())
-
-sfo_data_iyear_mean_df = sfo_data_iyear_df.groupby("year").mean()
+# Average of every metric per year (indexed by year), derived from the cube
+with profiler.stage("prices_by_year") as stage:
+    sfo_data_iyear_mean_df = sfo_data_cube.year_mean()
+    stage.output(sfo_data_iyear_mean_df)
 display("sfo_data_iyear_mean_df:", sfo_data_iyear_mean_df)
 
-print(f"Minumum average gross rent = {min(sfo_data_iyear_mean_df.gross_rent):0.2f}")
+print(f"Minumum average gross rent = {sfo_data_iyear_mean_df['gross_rent'].min():0.2f}")
 
 
 # **Question:** What is the lowest gross rent reported for the years included in the DataFrame?
@@ -346,7 +379,10 @@ prices_square_foot_by_year.hvplot.line(
 
 
 # Group by year and neighborhood and then create a new dataframe of the mean values
-prices_by_year_by_neighborhood =  sfo_data_df.groupby(["neighborhood", "year"]).mean()
+# (read straight out of the cube cells; only the neighborhood/year pairs present in the data are kept)
+with profiler.stage("neighborhood_rollup") as stage:
+    prices_by_year_by_neighborhood = sfo_data_cube.neighborhood_year_mean()
+    stage.output(prices_by_year_by_neighborhood)
 
 # Review the DataFrame
 display("prices_by_year_by_neighborhood:", prices_by_year_by_neighborhood)
@@ -374,15 +410,16 @@ display("prices_by_year_by_neighborhood tail:", prices_by_year_by_neighborhood.t
 
 # Use hvplot to create an interactive line plot of the average price per square foot
 # The plot should have a dropdown selector for the neighborhood
-prices_by_year_by_neighborhood.hvplot.line(
-    groupby = "neighborhood",
+# (each neighborhood's series is stored contiguously, so a selection is a slice, not a filter of the full frame)
+prices_by_neighborhood_store = NeighborhoodSeriesStore.from_frame(prices_by_year_by_neighborhood)
+neighborhood_line_plot(
+    prices_by_neighborhood_store,
     xlabel = "Year",
     ylabel = "Average Sale Price Per Sqr Foot / Gross Rent",
     title = "Average Sale Price Per Sqr Foot / Gross Rent in San Fransisco from 2010 to 2016 (Per Neighborhood)",
     frame_width = 700,
-    frame_height = 300    
-).opts(
-     yformatter='%.0f'
+    frame_height = 300,
+    opts = dict(yformatter='%.0f')
 )
 
 
@@ -429,12 +466,14 @@ prices_by_year_by_neighborhood.hvplot.line(
 
 
 # Load neighborhoods coordinates data
-neighborhood_locations_df = pd.read_csv(
-    Path('./Resources/neighborhoods_coordinates.csv')
-).dropna()
+with profiler.stage("location_join") as stage:
+    neighborhood_locations_df = pd.read_csv(
+        Path('./Resources/neighborhoods_coordinates.csv')
+    ).dropna()
 
-# Set the 'Neighborhood' as the index
-neighborhood_locations_df = neighborhood_locations_df.set_index('Neighborhood')
+    # Set the 'Neighborhood' as the index
+    neighborhood_locations_df = neighborhood_locations_df.set_index('Neighborhood')
+    stage.output(neighborhood_locations_df)
 
 # Review the DataFrame
 display("neighborhood_locations_df:", neighborhood_locations_df)
@@ -446,7 +485,9 @@ display("neighborhood_locations_df:", neighborhood_locations_df)
 
 
 # Calculate the mean values for each neighborhood
-all_neighborhood_info_df = sfo_data_df.groupby(["neighborhood"]).mean()
+with profiler.stage("neighborhood_rollup") as stage:
+    all_neighborhood_info_df = sfo_data_cube.neighborhood_mean()
+    stage.output(all_neighborhood_info_df)
 
 # Review the resulting DataFrame
 display("all_neighborhood_info_df:", all_neighborhood_info_df)
@@ -463,30 +504,25 @@ display("all_neighborhood_info_df:", all_neighborhood_info_df)
 # In[ ]:
 
 
-# Using the Pandas `concat` function, join the 
-# neighborhood_locations_df and the all_neighborhood_info_df DataFrame
-# The axis of the concatenation is "columns".
-# The concat function will automatially combine columns with
-# identical information, while keeping the additional columns.
-all_neighborhoods_df = pd.concat(
-    [neighborhood_locations_df, all_neighborhood_info_df], 
-    axis="columns",
-    sort=False
-)
+# Join the neighborhood_locations_df and the all_neighborhood_info_df DataFrame.
+# The coordinates are encoded through the same dictionary as the census names, so
+# both sides share integer IDs and the join is an integer lookup instead of a
+# string-keyed concat.
+with profiler.stage("location_join") as stage:
+    stage.input(neighborhood_locations_df, all_neighborhood_info_df)
+    location_join = join_by_id(neighborhood_dictionary, neighborhood_locations_df, all_neighborhood_info_df)
+    stage.output(location_join.joined_df)
 
-# Review the resulting DataFrame
-display(all_neighborhoods_df.head())
-display(all_neighborhoods_df.tail())
+# Report any neighborhoods that still could not be matched (these are left out of the map)
+# or that were given more than once (their rows are averaged)
+print(unmatched_report(location_join))
 
 
 # In[ ]:
 
 
-# Call the dropna function to remove any neighborhoods that do not have data
-all_neighborhoods_df = all_neighborhoods_df.reset_index().dropna()
-
-# Rename the "index" column as "Neighborhood" for use in the Visualization
-all_neighborhoods_df = all_neighborhoods_df.rename(columns={"index": "Neighborhood"})
+# The joined DataFrame already has a "Neighborhood" column for use in the Visualization
+all_neighborhoods_df = location_join.joined_df
 
 # Review the resulting DataFrame
 display(all_neighborhoods_df.head())
@@ -506,18 +542,21 @@ display(all_neighborhoods_df.tail())
 
 
 # Create a plot to analyze neighborhood info
-all_neighborhoods_df.hvplot.points(
-    'Lon', 
-    'Lat', 
-    geo = True, 
-    color = 'gross_rent',
-    title = "SF Neighborhood Gross Rents (by Sales Price Per Sqr Foot)",
-    size = "sale_price_sqr_foot",
-    tiles = 'OSM',
-    frame_width = 700,
-    frame_height = 500,
-    hover_cols='Neighborhood'
-)
+with profiler.stage("map") as stage:
+    stage.input(all_neighborhoods_df)
+    neighborhood_map = all_neighborhoods_df.hvplot.points(
+        'Lon', 
+        'Lat', 
+        geo = True, 
+        color = 'gross_rent',
+        title = "SF Neighborhood Gross Rents (by Sales Price Per Sqr Foot)",
+        size = "sale_price_sqr_foot",
+        tiles = 'OSM',
+        frame_width = 700,
+        frame_height = 500,
+        hover_cols='Neighborhood'
+    )
+neighborhood_map
 
 
 # ### Step 5: Use the interactive map to answer the following question:
@@ -530,14 +569,20 @@ all_neighborhoods_df.hvplot.points(
 
 
 # Confirm answer by checking dataframe for neighborhood that has the highest gross rent
-display("Highest gross rent:", all_neighborhoods_df.loc[all_neighborhoods_df["gross_rent"].idxmax()])
+with profiler.stage("answers") as stage:
+    stage.input(all_neighborhoods_df)
+    highest_gross_rent = all_neighborhoods_df.loc[all_neighborhoods_df["gross_rent"].idxmax()]
+display("Highest gross rent:", highest_gross_rent)
 
 
 # In[ ]:
 
 
 # Confirm answer by checking dataframe for neighborhood that has the highest sale_price_sqr_foot
-display("Highest Sale Per Sqr Foot:", all_neighborhoods_df.loc[all_neighborhoods_df["sale_price_sqr_foot"].idxmax()])
+with profiler.stage("answers") as stage:
+    stage.input(all_neighborhoods_df)
+    highest_sale_price_sqr_foot = all_neighborhoods_df.loc[all_neighborhoods_df["sale_price_sqr_foot"].idxmax()]
+display("Highest Sale Per Sqr Foot:", highest_sale_price_sqr_foot)
 
 
 # ## Compose Your Data Story
@@ -555,5 +600,10 @@ display("Highest Sale Per Sqr Foot:", all_neighborhoods_df.loc[all_neighborhoods
 # In[ ]:
 
 
+# Per-stage timing and memory of this run; open the trace in chrome://tracing or https://ui.perfetto.dev
+profiler.print_table()
+trace_path = Path('./Resources/.cache/san_francisco_housing.trace.json')
+trace_path.parent.mkdir(parents=True, exist_ok=True)
+profiler.write_chrome_trace(trace_path)
 
 
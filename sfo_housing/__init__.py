@@ -0,0 +1,28 @@
+"""Reusable building blocks for the San Francisco housing analysis.
+
+The notebook (and its ``san_francisco_housing.py`` export) walks through the
+analysis cell by cell; the modules in this package hold the parts of that
+pipeline that need to scale to the full production census extracts.
+"""
+
+from sfo_housing.loader import (
+    CENSUS_DATA_PATH,
+    CENSUS_DTYPES,
+    HOUSING_PER_YEAR_PATH,
+    METRIC_COLUMNS,
+    NEIGHBORHOOD_COORDINATES_PATH,
+    load_census_data,
+    load_housing_per_year,
+    load_neighborhood_coordinates,
+)
+
+__all__ = [
+    "CENSUS_DATA_PATH",
+    "CENSUS_DTYPES",
+    "HOUSING_PER_YEAR_PATH",
+    "METRIC_COLUMNS",
+    "NEIGHBORHOOD_COORDINATES_PATH",
+    "load_census_data",
+    "load_housing_per_year",
+    "load_neighborhood_coordinates",
+]
@@ -0,0 +1,192 @@
+"""The notebook's analysis stages as plain functions, with no plotting imports.
+
+Each stage mirrors one group of notebook cells and only needs pandas/numpy,
+so batch jobs can produce the tables and answers without pulling in hvplot,
+holoviews, bokeh, panel or geoviews.  Charts for these results live in
+:mod:`sfo_housing.plots`, which imports the plotting stack lazily.
+"""
+
+from collections import namedtuple
+
+from sfo_housing.column_stats import collect_stats
+from sfo_housing.cube import AggregationCube
+from sfo_housing.instrument import StageProfiler
+from sfo_housing.neighborhoods import NeighborhoodDictionary, join_by_id, unmatched_report
+from sfo_housing.loader import (
+    CENSUS_DATA_PATH,
+    NEIGHBORHOOD_COORDINATES_PATH,
+    load_census_data,
+    load_neighborhood_coordinates,
+)
+
+# Everything the notebook computes, in the order it computes it
+AnalysisResults = namedtuple(
+    "AnalysisResults",
+    [
+        "nan_entries",
+        "sfo_data_df",
+        "cube",
+        "housing_units_by_year",
+        "prices_square_foot_by_year",
+        "prices_by_year_by_neighborhood",
+        "all_neighborhood_info_df",
+        "all_neighborhoods_df",
+        "unmatched_neighborhoods",
+        "answers",
+        "stats",
+    ],
+)
+
+
+def ingest(path=CENSUS_DATA_PATH, **load_kwargs):
+    """Load the raw census rows (NaNs included)."""
+    return load_census_data(path, **load_kwargs)
+
+
+def clean(sfo_data_df, stats=None):
+    """Return ``(nan_entries, cleaned_df)``: the NaN audit and the rows without NaNs.
+
+    With the :class:`~sfo_housing.column_stats.TableStats` collected at
+    ingest, the audit is read from them and ``dropna`` only runs when some
+    row actually has a NaN.
+    """
+    if stats is None:
+        return int(sfo_data_df.isna().sum().sum()), sfo_data_df.dropna()
+    if stats.rows_with_nulls == 0:
+        return stats.nan_entries, sfo_data_df
+    return stats.nan_entries, sfo_data_df.dropna()
+
+
+def housing_units_rollup(cube):
+    """Average housing units per year (``housing_units_by_year``)."""
+    return cube.year_mean(["housing_units"])
+
+
+def prices_by_year_rollup(cube):
+    """Average sale price per sqr foot and gross rent per year (``prices_square_foot_by_year``)."""
+    return cube.year_mean(["sale_price_sqr_foot", "gross_rent"])
+
+
+def year_rollups(cube):
+    """Return ``(housing_units_by_year, prices_square_foot_by_year)``."""
+    return housing_units_rollup(cube), prices_by_year_rollup(cube)
+
+
+def neighborhood_rollups(cube):
+    """Return ``(prices_by_year_by_neighborhood, all_neighborhood_info_df)``."""
+    prices_by_year_by_neighborhood = cube.neighborhood_year_mean(["sale_price_sqr_foot", "gross_rent"])
+    all_neighborhood_info_df = cube.neighborhood_mean()
+    return prices_by_year_by_neighborhood, all_neighborhood_info_df
+
+
+def join_locations(neighborhood_locations_df, all_neighborhood_info_df, dictionary=None):
+    """Attach the neighborhood means to their coordinates.
+
+    Replaces the notebook's string-keyed concat + dropna: both sides are
+    encoded through a shared :class:`~sfo_housing.neighborhoods.NeighborhoodDictionary`
+    and joined by integer ID.  Returns a
+    :data:`~sfo_housing.neighborhoods.LocationJoin` listing the unmatched keys.
+    """
+    dictionary = dictionary if dictionary is not None else NeighborhoodDictionary()
+    return join_by_id(dictionary, neighborhood_locations_df, all_neighborhood_info_df)
+
+
+def price_drops(prices_square_foot_by_year):
+    """Years whose average sale price per square foot fell from the previous year.
+
+    Returns the year-over-year change of both metrics for those years, so the
+    gross rent direction in the same year can be read off directly.
+    """
+    changes = prices_square_foot_by_year.diff()
+    return changes[changes["sale_price_sqr_foot"] < 0]
+
+
+def answer_questions(prices_square_foot_by_year, all_neighborhoods_df):
+    """The notebook's questions, answered from the computed tables."""
+    drops = price_drops(prices_square_foot_by_year)
+    highest_rent = all_neighborhoods_df.loc[all_neighborhoods_df["gross_rent"].idxmax()]
+    highest_price = all_neighborhoods_df.loc[all_neighborhoods_df["sale_price_sqr_foot"].idxmax()]
+    return {
+        "min_average_gross_rent": float(prices_square_foot_by_year["gross_rent"].min()),
+        "price_drops": [
+            {
+                "year": int(year),
+                "sale_price_sqr_foot_change": float(change["sale_price_sqr_foot"]),
+                "gross_rent_change": float(change["gross_rent"]),
+            }
+            for year, change in drops.iterrows()
+        ],
+        "highest_gross_rent_neighborhood": highest_rent["Neighborhood"],
+        "highest_sale_price_sqr_foot_neighborhood": highest_price["Neighborhood"],
+    }
+
+
+def run_analysis(
+    census_path=CENSUS_DATA_PATH,
+    coordinates_path=NEIGHBORHOOD_COORDINATES_PATH,
+    profiler=None,
+    **load_kwargs,
+):
+    """Run every analysis stage end to end and return an :data:`AnalysisResults`.
+
+    Pass a :class:`~sfo_housing.instrument.StageProfiler` to record timing and
+    memory for each stage.
+    """
+    profiler = profiler or StageProfiler(enabled=False)
+
+    with profiler.stage("ingest") as stage:
+        raw_df = ingest(census_path, **load_kwargs)
+        stats = collect_stats(raw_df)
+        stage.output(raw_df)
+
+    with profiler.stage("nan_audit") as stage:
+        stage.input(raw_df)
+        nan_entries, sfo_data_df = clean(raw_df, stats)
+        stage.output(sfo_data_df)
+    del raw_df
+
+    with profiler.stage("aggregate") as stage:
+        stage.input(sfo_data_df)
+        # The census names are encoded through the dictionary the location join reuses
+        dictionary = NeighborhoodDictionary()
+        cube = AggregationCube.from_frame(sfo_data_df, dictionary=dictionary)
+        # One output "row" per (neighborhood, year) cell
+        stage.rows_out = int(cube.rows.size)
+        stage.bytes_out = int(cube.sums.nbytes + cube.counts.nbytes + cube.rows.nbytes)
+
+    with profiler.stage("housing_units_by_year") as stage:
+        housing_units_by_year = housing_units_rollup(cube)
+        stage.output(housing_units_by_year)
+
+    with profiler.stage("prices_by_year") as stage:
+        prices_square_foot_by_year = prices_by_year_rollup(cube)
+        stage.output(prices_square_foot_by_year)
+
+    with profiler.stage("neighborhood_rollup") as stage:
+        prices_by_year_by_neighborhood, all_neighborhood_info_df = neighborhood_rollups(cube)
+        stage.output(prices_by_year_by_neighborhood, all_neighborhood_info_df)
+
+    with profiler.stage("location_join") as stage:
+        neighborhood_locations_df = load_neighborhood_coordinates(coordinates_path)
+        stage.input(neighborhood_locations_df, all_neighborhood_info_df)
+        location_join = join_locations(neighborhood_locations_df, all_neighborhood_info_df, dictionary)
+        all_neighborhoods_df = location_join.joined_df
+        stage.output(all_neighborhoods_df)
+
+    with profiler.stage("answers") as stage:
+        stage.input(prices_square_foot_by_year, all_neighborhoods_df)
+        answers = answer_questions(prices_square_foot_by_year, all_neighborhoods_df)
+
+    return AnalysisResults(
+        nan_entries,
+        sfo_data_df,
+        cube,
+        housing_units_by_year,
+        prices_square_foot_by_year,
+        prices_by_year_by_neighborhood,
+        all_neighborhood_info_df,
+        all_neighborhoods_df,
+        unmatched_report(location_join),
+        answers,
+        stats,
+    )
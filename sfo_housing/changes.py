@@ -0,0 +1,100 @@
+"""Vectorized year-over-year change detection over the (neighborhood, year) cube.
+
+The notebook answers "did any year drop?" by eye, city-wide only.  Here the
+cube's means are laid out as a dense (neighborhood x year x metric) array and
+every neighborhood's diffs, percentage changes and rolling trends come out of
+a handful of array operations, with no per-group Python loop.
+
+When a new year arrives, append it to the cube and call ``yoy_changes`` with
+``years=[new_year]``: only that year and the ``window`` years before it are
+read, so the refresh costs O(neighborhoods x window) regardless of history.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Metrics checked for changes by default
+CHANGE_METRICS = ["sale_price_sqr_foot", "gross_rent"]
+
+# Years in the rolling trend of percentage changes
+DEFAULT_TREND_WINDOW = 3
+
+
+def _rolling_mean(values, window):
+    """Trailing mean over the last ``window`` entries of axis 1, ignoring NaNs."""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    pad = np.zeros(values.shape[:1] + (1,) + values.shape[2:])
+    sums = np.concatenate([pad, np.cumsum(filled, axis=1)], axis=1)
+    counts = np.concatenate([pad, np.cumsum(valid, axis=1)], axis=1)
+    # Position i covers entries max(i - window + 1, 0) .. i
+    end = np.arange(1, values.shape[1] + 1)
+    start = np.maximum(end - window, 0)
+    window_sums = sums[:, end] - sums[:, start]
+    window_counts = counts[:, end] - counts[:, start]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts > 0, window_sums / window_counts, np.nan)
+
+
+def yoy_changes(cube, metrics=CHANGE_METRICS, years=None, window=DEFAULT_TREND_WINDOW):
+    """Year-over-year changes for every (neighborhood, year) cell of ``cube``.
+
+    Returns a frame indexed by (neighborhood, year) with, per metric,
+    ``<metric>_diff`` (change from the previous year in the cube),
+    ``<metric>_pct`` (that change as a fraction of the previous value) and
+    ``<metric>_trend`` (mean ``_pct`` over the trailing ``window`` years), plus
+    a ``price_drop_rent_rise`` flag.  Pass ``years`` to compute only those
+    years (the incremental path).
+    """
+    positions = [cube.metrics.index(metric) for metric in metrics]
+    all_years = cube.years.to_numpy()
+
+    # Only the requested years, the year before each and the trend window behind them are needed
+    if years is None:
+        first, last = 0, len(all_years)
+    else:
+        year_positions = cube.years.get_indexer(list(years))
+        if (year_positions < 0).any():
+            raise KeyError(f"Years not in the cube: {sorted(set(years) - set(all_years))}")
+        first, last = max(year_positions.min() - window, 0), year_positions.max() + 1
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = cube.sums[:, first:last][..., positions] / cube.counts[:, first:last][..., positions]
+    observed = cube.rows[:, first:last] > 0
+
+    previous = np.concatenate([np.full_like(means[:, :1], np.nan), means[:, :-1]], axis=1)
+    diff = means - previous
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = diff / previous
+    trend = _rolling_mean(pct, window)
+
+    # Keep observed cells of the requested years
+    keep = observed.copy()
+    if years is not None:
+        keep &= np.isin(all_years[first:last], list(years))[None, :]
+    neighborhood_idx, year_idx = np.nonzero(keep)
+
+    columns = {}
+    for column, metric in enumerate(metrics):
+        columns[f"{metric}_diff"] = diff[neighborhood_idx, year_idx, column]
+        columns[f"{metric}_pct"] = pct[neighborhood_idx, year_idx, column]
+        columns[f"{metric}_trend"] = trend[neighborhood_idx, year_idx, column]
+    changes_df = pd.DataFrame(
+        columns,
+        index=pd.MultiIndex.from_arrays(
+            [cube.neighborhoods[neighborhood_idx], all_years[first:last][year_idx]],
+            names=["neighborhood", "year"],
+        ),
+    )
+
+    if "sale_price_sqr_foot" in metrics and "gross_rent" in metrics:
+        changes_df["price_drop_rent_rise"] = (
+            (changes_df["sale_price_sqr_foot_diff"] < 0) & (changes_df["gross_rent_diff"] > 0)
+        )
+    return changes_df
+
+
+def price_drop_alerts(changes_df):
+    """Cells where the price per square foot fell while gross rent rose, biggest price drop first."""
+    alerts = changes_df[changes_df["price_drop_rent_rise"]]
+    return alerts.sort_values("sale_price_sqr_foot_pct")
@@ -0,0 +1,284 @@
+"""Single-pass column statistics collected while the census rows are ingested.
+
+The notebook rediscovers the same facts several times: ``isna().sum().sum()``
+scans every cell and ``dropna`` scans them again.  A ``ColumnStatsCollector``
+sees every row once (one frame, or chunk by chunk) and records, per column,
+the null count, non-null count, min, max, sum and mean.  That is a few
+vectorized reductions per column, cheap enough for the ingest hot path.
+
+Costlier statistics are opt-in: an estimated distinct count
+(``distinct=True``), approximate quantiles (``quantiles=True``) and
+count/min/max/sum/mean per group (``group_by=("year", ...)``).  Per-year means
+of the metrics are better read from the aggregation cube, which computes them
+anyway.
+
+Null counts describe the raw rows.  Every other figure describes the complete
+rows, i.e. the rows ``dropna()`` keeps, which is what the downstream stages
+aggregate.  Collectors over separate chunks can be merged.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Values kept per column for the approximate quantiles (exact below this many rows)
+DEFAULT_SAMPLE_SIZE = 4096
+
+# Smallest hashes kept per column for the distinct count estimate (exact below this many values)
+DEFAULT_DISTINCT_SIZE = 1024
+
+# Quantiles reported in the per-column summary
+SUMMARY_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+_HASH_SPACE = float(2 ** 64)
+
+# Per-group statistics and how two partial results for the same group combine
+_GROUP_MERGE = {"count": "sum", "min": "min", "max": "max", "sum": "sum"}
+
+# Running statistics of one column
+#   - sample / priorities: uniform sample of the non-null values (bottom-k of random priorities),
+#     empty unless quantiles are collected
+#   - hashes: smallest distinct 64-bit hashes of the values (k-minimum-values sketch),
+#     empty unless distinct counts are collected
+_ColumnState = namedtuple("_ColumnState", ["nulls", "count", "min", "max", "sum", "sample", "priorities", "hashes"])
+
+
+def _numeric(series):
+    return pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype)
+
+
+def _keep_smallest(keys, *arrays, k):
+    # The k entries with the smallest keys (all of them when there are fewer)
+    if len(keys) <= k:
+        return (keys,) + arrays
+    chosen = np.argpartition(keys, k - 1)[:k]
+    return (keys[chosen],) + tuple(array[chosen] for array in arrays)
+
+
+class TableStats:
+    """Finished statistics of a table; see :class:`ColumnStatsCollector`.
+
+    ``columns`` is a DataFrame with one row per column (plus ``distinct`` and
+    quantile columns when those were collected); ``groups`` maps each
+    requested group key to a DataFrame indexed by the group values with
+    (column, stat) columns, stats being ``count``, ``min``, ``max``, ``sum``
+    and ``mean``.
+    """
+
+    def __init__(self, rows, rows_with_nulls, columns, groups, samples):
+        self.rows = rows
+        self.rows_with_nulls = rows_with_nulls
+        self.columns = columns
+        self.groups = groups
+        self._samples = samples
+
+    @property
+    def nan_entries(self):
+        """Total NaN cells, i.e. ``isna().sum().sum()`` of the raw rows."""
+        return int(self.columns["nulls"].sum())
+
+    @property
+    def complete_rows(self):
+        """Rows without any NaN, i.e. ``len(dropna())``."""
+        return self.rows - self.rows_with_nulls
+
+    def value_range(self, column):
+        """``(min, max)`` of ``column`` over the complete rows."""
+        return self.columns.at[column, "min"], self.columns.at[column, "max"]
+
+    def quantile(self, column, q):
+        """Approximate quantile(s) of ``column`` from its sample (exact when every value was kept).
+
+        NaN unless the statistics were collected with ``quantiles=True``.
+        """
+        sample = self._samples.get(column)
+        if sample is None or not len(sample):
+            return np.nan if np.ndim(q) == 0 else np.full(len(q), np.nan)
+        return np.quantile(sample, q)
+
+    def group_means(self, key, column):
+        """Mean of ``column`` per ``key`` group, e.g. ``group_means("year", "gross_rent")``."""
+        return self.groups[key][(column, "mean")]
+
+    def group_mean_range(self, key, column):
+        """``(min, max)`` over the ``key`` groups of the mean of ``column``."""
+        means = self.group_means(key, column)
+        return means.min(), means.max()
+
+
+class ColumnStatsCollector:
+    """Accumulates :class:`TableStats` over one frame or a stream of chunks."""
+
+    def __init__(
+        self,
+        group_by=(),
+        distinct=False,
+        quantiles=False,
+        sample_size=DEFAULT_SAMPLE_SIZE,
+        distinct_size=DEFAULT_DISTINCT_SIZE,
+        seed=0,
+    ):
+        self.group_by = list(group_by)
+        self.distinct = distinct
+        self.quantiles = quantiles
+        self.sample_size = sample_size
+        self.distinct_size = distinct_size
+        self._rng = np.random.default_rng(seed)
+        self.rows = 0
+        self.rows_with_nulls = 0
+        self._columns = {}
+        self._groups = {}
+
+    def update(self, frame):
+        """Fold one frame (or chunk) of rows into the statistics."""
+        nulls = frame.isna().to_numpy()
+        null_counts = nulls.sum(axis=0)
+        complete = ~nulls.any(axis=1)
+        rows_with_nulls = len(frame) - int(complete.sum())
+        self.rows += len(frame)
+        self.rows_with_nulls += rows_with_nulls
+
+        empty = np.empty(0)
+        complete_count = len(frame) - rows_with_nulls
+        for position, column in enumerate(frame.columns):
+            series = frame[column]
+            hashes = empty
+            if self.distinct:
+                kept = series[complete] if rows_with_nulls else series
+                hashes = self._smallest_hashes(pd.util.hash_pandas_object(kept, index=False).to_numpy())
+            if _numeric(series):
+                values = series.to_numpy(dtype=np.float64)
+                # Only subset when some row is incomplete; the common case reduces the column as is
+                if rows_with_nulls:
+                    values = values[complete]
+                priorities = self._rng.random(len(values)) if self.quantiles else empty
+                stats = (
+                    values.min() if len(values) else np.nan,
+                    values.max() if len(values) else np.nan,
+                    values.sum(),
+                    values if self.quantiles else empty,
+                    priorities,
+                )
+            else:
+                stats = (np.nan, np.nan, np.nan, empty, empty)
+            self._fold_column(column, _ColumnState(int(null_counts[position]), complete_count, *stats, hashes))
+
+        if self.group_by:
+            numeric_columns = [
+                column for column in frame.columns if _numeric(frame[column]) and column not in self.group_by
+            ]
+            complete_df = frame[complete] if rows_with_nulls else frame
+            for key in self.group_by:
+                if key in frame.columns:
+                    self._fold_group(key, self._group_stats(complete_df, key, numeric_columns))
+        return self
+
+    def _smallest_hashes(self, hashes):
+        """The ``distinct_size`` smallest distinct hashes, sorted, without sorting every hash."""
+        k = self.distinct_size
+        if len(hashes) > 4 * k:
+            # Distinct values among the 4k smallest hashes; only repeated values leave fewer than k
+            candidates = hashes[hashes <= np.partition(hashes, 4 * k)[4 * k]]
+            candidates = np.unique(candidates)
+            if len(candidates) >= k:
+                return candidates[:k]
+        return np.unique(hashes)[:k]
+
+    def _group_stats(self, frame, key, columns):
+        # Integer codes per group value, then one bincount / ufunc.at per column and stat
+        codes, uniques = pd.factorize(frame[key], sort=True)
+        n_groups = len(uniques)
+        stats = {}
+        for column in columns:
+            values = frame[column].to_numpy(dtype=np.float64)
+            minimum = np.full(n_groups, np.inf)
+            maximum = np.full(n_groups, -np.inf)
+            np.minimum.at(minimum, codes, values)
+            np.maximum.at(maximum, codes, values)
+            stats[(column, "count")] = np.bincount(codes, minlength=n_groups)
+            stats[(column, "min")] = minimum
+            stats[(column, "max")] = maximum
+            stats[(column, "sum")] = np.bincount(codes, weights=values, minlength=n_groups)
+        index = pd.Index(np.asarray(uniques), name=key)
+        return pd.DataFrame(stats, index=index, columns=pd.MultiIndex.from_tuples(stats, names=["column", "stat"]))
+
+    def _fold_column(self, column, state):
+        previous = self._columns.get(column)
+        if previous is not None:
+            state = _ColumnState(
+                previous.nulls + state.nulls,
+                previous.count + state.count,
+                np.fmin(previous.min, state.min),
+                np.fmax(previous.max, state.max),
+                np.nansum([previous.sum, state.sum]),
+                np.concatenate([previous.sample, state.sample]),
+                np.concatenate([previous.priorities, state.priorities]),
+                np.union1d(previous.hashes, state.hashes),
+            )
+        priorities, sample = _keep_smallest(state.priorities, state.sample, k=self.sample_size)
+        hashes = state.hashes[: self.distinct_size]  # union1d/unique keep the hashes sorted
+        self._columns[column] = state._replace(sample=sample, priorities=priorities, hashes=hashes)
+
+    def _fold_group(self, key, group_df):
+        previous = self._groups.get(key)
+        if previous is not None:
+            combined = pd.concat([previous, group_df])
+            how = {column: _GROUP_MERGE[column[1]] for column in combined.columns}
+            group_df = combined.groupby(level=0, sort=True).agg(how)
+        self._groups[key] = group_df
+
+    def merge(self, other):
+        """Fold the statistics of another collector (e.g. over another chunk) into this one."""
+        self.rows += other.rows
+        self.rows_with_nulls += other.rows_with_nulls
+        for column, state in other._columns.items():
+            self._fold_column(column, state)
+        for key, group_df in other._groups.items():
+            self._fold_group(key, group_df)
+        return self
+
+    def _distinct(self, hashes):
+        # k-minimum-values estimate: k hashes spread over the k-th smallest hash's share of the space
+        if len(hashes) < self.distinct_size:
+            return len(hashes)
+        return int(round((self.distinct_size - 1) * _HASH_SPACE / (float(hashes[-1]) + 1.0)))
+
+    def result(self):
+        """The collected :class:`TableStats`."""
+        rows = {}
+        samples = {}
+        for column, state in self._columns.items():
+            rows[column] = {
+                "nulls": state.nulls,
+                "count": state.count,
+                "min": state.min,
+                "max": state.max,
+                "sum": state.sum,
+                "mean": state.sum / state.count if state.count else np.nan,
+            }
+            if self.distinct:
+                rows[column]["distinct"] = self._distinct(state.hashes)
+            if self.quantiles:
+                samples[column] = np.sort(state.sample)
+                quantiles = (
+                    np.quantile(samples[column], SUMMARY_QUANTILES)
+                    if len(state.sample)
+                    else [np.nan] * len(SUMMARY_QUANTILES)
+                )
+                rows[column].update({f"p{round(q * 100):02d}": value for q, value in zip(SUMMARY_QUANTILES, quantiles)})
+        columns_df = pd.DataFrame.from_dict(rows, orient="index")
+
+        groups = {}
+        for key, group_df in self._groups.items():
+            group_df = group_df.copy()
+            for column in group_df.columns.get_level_values("column").unique():
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    group_df[(column, "mean")] = group_df[(column, "sum")] / group_df[(column, "count")]
+            groups[key] = group_df.sort_index(axis="columns", level="column", sort_remaining=False)
+        return TableStats(self.rows, self.rows_with_nulls, columns_df, groups, samples)
+
+
+def collect_stats(frame, group_by=(), **collector_kwargs):
+    """:class:`TableStats` of ``frame`` in one pass (see :class:`ColumnStatsCollector` for the options)."""
+    return ColumnStatsCollector(group_by, **collector_kwargs).update(frame).result()
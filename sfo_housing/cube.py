@@ -0,0 +1,247 @@
+"""Single-pass (neighborhood, year) aggregation cube.
+
+The notebook groups the census rows by year, by neighborhood and by
+(neighborhood, year) separately, rescanning every row each time.  The cube
+scans the rows once and keeps the sum and count of every metric per
+(neighborhood, year) cell; every mean the analysis needs is then derived by
+summing cells, never by touching the rows again.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sfo_housing.loader import METRIC_COLUMNS
+from sfo_housing.neighborhoods import NeighborhoodDictionary
+
+
+class AggregationCube:
+    """Per (neighborhood, year) sums and counts of the census metrics.
+
+    ``sums`` and ``counts`` have shape (neighborhood, year, metric); counts
+    are per metric so NaN values are skipped the same way ``mean()`` skips
+    them.  ``rows`` has shape (neighborhood, year) and counts the census
+    rows that fell in each cell.
+    """
+
+    def __init__(self, neighborhoods, years, metrics, sums, counts, rows):
+        self.neighborhoods = pd.Index(neighborhoods, name="neighborhood")
+        self.years = pd.Index(np.asarray(years, dtype=np.int64), name="year")
+        self.metrics = list(metrics)
+        self.sums = sums
+        self.counts = counts
+        self.rows = rows
+
+    @classmethod
+    def from_frame(cls, census_df, metrics=METRIC_COLUMNS, dictionary=None):
+        """Build the cube from census rows in a single scan.
+
+        Neighborhood names are encoded through ``dictionary`` (a fresh
+        :class:`NeighborhoodDictionary` by default), so spelling variants such
+        as ``"Downtown"`` and ``"Downtown "`` share one cell, labelled with the
+        dictionary's tidied display label.  Pass the same dictionary when
+        building several cubes that will be merged.
+        """
+        dictionary = dictionary if dictionary is not None else NeighborhoodDictionary()
+
+        # Integer codes for both keys: categorical codes are free, anything else is factorized once
+        neighborhood = census_df["neighborhood"]
+        if isinstance(neighborhood.dtype, pd.CategoricalDtype):
+            name_codes = neighborhood.cat.codes.to_numpy()
+            names = neighborhood.cat.categories
+        else:
+            name_codes, names = pd.factorize(neighborhood)
+        # Only the distinct spellings go through the dictionary; they then collapse onto sorted labels
+        labels = dictionary.decode(dictionary.encode(names)).astype(str)
+        neighborhoods, label_codes = np.unique(labels, return_inverse=True)
+        # A trailing -1 so rows without a name (code -1) stay -1
+        neighborhood_codes = np.append(label_codes.reshape(-1), -1)[name_codes]
+        # Rows without a neighborhood (code -1) cannot be placed in a cell
+        keyed = neighborhood_codes >= 0
+        neighborhood_codes = neighborhood_codes[keyed]
+        years, year_codes = np.unique(census_df["year"].to_numpy()[keyed], return_inverse=True)
+
+        n_neighborhoods, n_years = len(neighborhoods), len(years)
+        cell = neighborhood_codes.astype(np.int64) * n_years + year_codes
+        n_cells = n_neighborhoods * n_years
+
+        # One bincount per column over the flat cell id: sums, non-NaN counts and row counts
+        sums = np.zeros((n_cells, len(metrics)), dtype=np.float64)
+        counts = np.zeros((n_cells, len(metrics)), dtype=np.int64)
+        for position, metric in enumerate(metrics):
+            values = census_df[metric].to_numpy(dtype=np.float64)[keyed]
+            valid = ~np.isnan(values)
+            sums[:, position] = np.bincount(cell[valid], weights=values[valid], minlength=n_cells)
+            counts[:, position] = np.bincount(cell[valid], minlength=n_cells)
+        rows = np.bincount(cell, minlength=n_cells)
+
+        return cls(
+            neighborhoods,
+            years,
+            metrics,
+            sums.reshape(n_neighborhoods, n_years, len(metrics)),
+            counts.reshape(n_neighborhoods, n_years, len(metrics)),
+            rows.reshape(n_neighborhoods, n_years),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a cube written by :meth:`save`."""
+        with np.load(Path(path), allow_pickle=False) as state:
+            return cls(
+                state["neighborhoods"],
+                state["years"],
+                state["metrics"].tolist(),
+                state["sums"],
+                state["counts"],
+                state["rows"],
+            )
+
+    def save(self, path):
+        """Persist the running sums and counts so later runs can append to them."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and swap it in so a crash never leaves a half-written state
+        partial_path = path.with_name(path.name + ".partial")
+        with open(partial_path, "wb") as state:
+            np.savez(
+                state,
+                neighborhoods=self.neighborhoods.to_numpy(dtype=str),
+                years=self.years.to_numpy(),
+                metrics=np.asarray(self.metrics, dtype=str),
+                sums=self.sums,
+                counts=self.counts,
+                rows=self.rows,
+            )
+        partial_path.replace(path)
+
+    def merge(self, other):
+        """Return a cube holding the combined sums and counts of ``self`` and ``other``.
+
+        Both axes are kept sorted, as ``groupby`` sorts its keys.  Because only
+        sums and counts are stored, the result is identical to building a cube
+        from both sets of rows at once.
+        """
+        if other.metrics != self.metrics:
+            raise ValueError(f"Cannot merge cubes with metrics {self.metrics} and {other.metrics}")
+
+        neighborhoods = self.neighborhoods.union(other.neighborhoods)
+        years = self.years.union(other.years)
+        shape = (len(neighborhoods), len(years))
+
+        sums = np.zeros(shape + (len(self.metrics),), dtype=np.float64)
+        counts = np.zeros(shape + (len(self.metrics),), dtype=np.int64)
+        rows = np.zeros(shape, dtype=np.int64)
+        for cube in (self, other):
+            neighborhood_pos = neighborhoods.get_indexer(cube.neighborhoods)[:, None]
+            year_pos = years.get_indexer(cube.years)[None, :]
+            sums[neighborhood_pos, year_pos] += cube.sums
+            counts[neighborhood_pos, year_pos] += cube.counts
+            rows[neighborhood_pos, year_pos] += cube.rows
+
+        return AggregationCube(neighborhoods, years, self.metrics, sums, counts, rows)
+
+    def without_years(self, years):
+        """Return a cube with every cell of ``years`` dropped (their sums and counts subtracted out)."""
+        keep = ~self.years.isin(np.asarray(list(years), dtype=np.int64))
+        return AggregationCube(
+            self.neighborhoods,
+            self.years[keep],
+            self.metrics,
+            self.sums[:, keep],
+            self.counts[:, keep],
+            self.rows[:, keep],
+        )
+
+    def append(self, census_df, replace_years=False):
+        """Fold new census rows (e.g. a new year) into the cube.
+
+        Only the new rows are scanned; the cost is independent of how much
+        history the cube already holds (beyond its neighborhood x year cells).
+
+        Rows for a year the cube already holds would be counted twice, so
+        they raise ``ValueError`` unless ``replace_years`` is set, in which
+        case the old cells of those years are dropped first and the new rows
+        take their place (a corrected re-release of a year).
+        """
+        # New spellings of neighborhoods already in the cube fold into their existing labels
+        dictionary = NeighborhoodDictionary()
+        dictionary.encode(self.neighborhoods)
+        new = AggregationCube.from_frame(census_df, self.metrics, dictionary)
+        overlap = self.years[self.rows.sum(axis=0) > 0].intersection(new.years[new.rows.sum(axis=0) > 0])
+        if len(overlap):
+            if not replace_years:
+                raise ValueError(
+                    f"Cube already holds year(s) {overlap.tolist()}; pass replace_years=True to replace them"
+                )
+            return self.without_years(overlap).merge(new)
+        return self.merge(new)
+
+    def _means(self, sums, counts):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return sums / counts
+
+    def neighborhood_year_mean(self, metrics=None):
+        """Equivalent of ``groupby(["neighborhood", "year"]).mean()`` (observed cells only)."""
+        columns = self._metric_positions(metrics)
+        neighborhood_idx, year_idx = np.nonzero(self.rows)
+        means = self._means(self.sums, self.counts)[neighborhood_idx, year_idx][:, columns]
+        index = pd.MultiIndex.from_arrays(
+            [self.neighborhoods[neighborhood_idx], self.years[year_idx]],
+            names=["neighborhood", "year"],
+        )
+        return pd.DataFrame(means, index=index, columns=self._metric_names(columns))
+
+    def year_mean(self, metrics=None):
+        """Equivalent of ``groupby("year").mean()`` on the metric columns."""
+        columns = self._metric_positions(metrics)
+        observed = self.rows.sum(axis=0) > 0
+        means = self._means(self.sums.sum(axis=0), self.counts.sum(axis=0))
+        return pd.DataFrame(
+            means[observed][:, columns],
+            index=self.years[observed],
+            columns=self._metric_names(columns),
+        )
+
+    def neighborhood_mean(self, metrics=None):
+        """Equivalent of ``groupby("neighborhood").mean()`` on the metric columns."""
+        columns = self._metric_positions(metrics)
+        observed = self.rows.sum(axis=1) > 0
+        means = self._means(self.sums.sum(axis=1), self.counts.sum(axis=1))
+        return pd.DataFrame(
+            means[observed][:, columns],
+            index=self.neighborhoods[observed],
+            columns=self._metric_names(columns),
+        )
+
+    def overall_mean(self, metrics=None):
+        """Mean of each metric over every census row."""
+        columns = self._metric_positions(metrics)
+        means = self._means(self.sums.sum(axis=(0, 1)), self.counts.sum(axis=(0, 1)))
+        return pd.Series(means[columns], index=self._metric_names(columns))
+
+    def _metric_positions(self, metrics):
+        if metrics is None:
+            return list(range(len(self.metrics)))
+        return [self.metrics.index(metric) for metric in metrics]
+
+    def _metric_names(self, positions):
+        return [self.metrics[position] for position in positions]
+
+
+def append_census_rows(state_path, census_df, replace_years=False):
+    """Incremental refresh: fold ``census_df`` into the cube persisted at ``state_path``.
+
+    The first call (no state yet) simply builds the cube from ``census_df``.
+    Years already in the state are rejected unless ``replace_years`` is set
+    (see :meth:`AggregationCube.append`); the state is then left untouched.
+    Returns the updated cube, which is also written back to ``state_path``.
+    """
+    state_path = Path(state_path)
+    if state_path.exists():
+        cube = AggregationCube.load(state_path).append(census_df, replace_years)
+    else:
+        cube = AggregationCube.from_frame(census_df)
+    cube.save(state_path)
+    return cube
@@ -0,0 +1,223 @@
+"""Server-side aggregation for property-level maps with millions of points.
+
+``all_neighborhoods_df.hvplot.points(...)`` ships every row to the browser,
+which is fine for ~70 neighborhood centroids but not for individual listings.
+``PointPyramid`` bins the points once into a pyramid of square grids (each
+level halving the cell size, like map tile zoom levels) holding per-cell
+counts and metric sums.  A view request picks the level that matches the
+visible range and slices that grid, so its cost depends on the number of
+cells on screen, not on the number of points.  Only once the view is zoomed
+in far enough to contain few points are the raw points (with hover detail)
+returned.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Metrics averaged per cell
+GEO_METRICS = ["gross_rent", "sale_price_sqr_foot"]
+
+# Finest pyramid level: 2**10 x 2**10 cells over the data extent
+DEFAULT_MAX_LEVEL = 10
+
+# Target resolution of an aggregated view (cells across the visible range)
+DEFAULT_VIEW_CELLS = 200
+
+# Views containing at most this many points are drawn as raw points
+DEFAULT_RAW_POINT_LIMIT = 5000
+
+_WEB_MERCATOR_RADIUS = 6378137.0
+
+
+def lon_lat_to_web_mercator(lon, lat):
+    """Project longitude/latitude (degrees) to Web Mercator metres, the tile map coordinate system."""
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    x = np.radians(lon) * _WEB_MERCATOR_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * _WEB_MERCATOR_RADIUS
+    return x, y
+
+
+class PointPyramid:
+    """Multi-resolution grid of point counts and metric sums, plus a cell-sorted point index."""
+
+    def __init__(self, x, y, values, max_level=DEFAULT_MAX_LEVEL, detail=None):
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        keep = ~(np.isnan(x) | np.isnan(y))
+        self.x, self.y = x[keep], y[keep]
+        self.values = {name: np.asarray(column, dtype=np.float64)[keep] for name, column in values.items()}
+        self.metrics = list(self.values)
+        self.detail = detail[keep].reset_index(drop=True) if detail is not None else None
+        self.max_level = max_level
+
+        # Square extent so cells are square at every level
+        if len(self.x):
+            self.x0, self.y0 = self.x.min(), self.y.min()
+            self.size = max(self.x.max() - self.x0, self.y.max() - self.y0) * (1 + 1e-9) or 1.0
+        else:
+            # No located points: a unit extent at the origin, every grid and view is then empty
+            self.x0, self.y0 = 0.0, 0.0
+            self.size = 1.0
+
+        # Finest level: one bincount per metric over the flat cell id
+        side = 2 ** max_level
+        cell_x = self._cell_index(self.x, self.x0, side)
+        cell_y = self._cell_index(self.y, self.y0, side)
+        cell = cell_y * side + cell_x
+
+        counts = np.bincount(cell, minlength=side * side).reshape(side, side)
+        sums, valid_counts = {}, {}
+        for name, column in self.values.items():
+            valid = ~np.isnan(column)
+            sums[name] = np.bincount(cell[valid], weights=column[valid], minlength=side * side).reshape(side, side)
+            valid_counts[name] = np.bincount(cell[valid], minlength=side * side).reshape(side, side)
+
+        # Coarser levels: sum each 2x2 block of the level below
+        self.levels = [None] * (max_level + 1)
+        self.levels[max_level] = (counts, sums, valid_counts)
+        for level in range(max_level - 1, -1, -1):
+            counts, sums, valid_counts = self.levels[level + 1]
+            self.levels[level] = (
+                self._coarsen(counts),
+                {name: self._coarsen(grid) for name, grid in sums.items()},
+                {name: self._coarsen(grid) for name, grid in valid_counts.items()},
+            )
+
+        # Points sorted by finest cell, with CSR offsets, for raw point retrieval
+        self._order = np.argsort(cell, kind="stable")
+        self._offsets = np.concatenate([[0], np.cumsum(self.levels[max_level][0].ravel())])
+
+    @classmethod
+    def from_frame(cls, listings_df, lon="Lon", lat="Lat", metrics=GEO_METRICS, **kwargs):
+        """Build from a listings frame with longitude/latitude and metric columns.
+
+        All columns are kept as hover detail for the raw points view.
+        """
+        x, y = lon_lat_to_web_mercator(listings_df[lon], listings_df[lat])
+        values = {metric: listings_df[metric].to_numpy() for metric in metrics}
+        return cls(x, y, values, detail=listings_df, **kwargs)
+
+    def _cell_index(self, coordinate, origin, side):
+        cell = np.floor((coordinate - origin) / (self.size / side)).astype(np.int64)
+        return np.clip(cell, 0, side - 1)
+
+    @staticmethod
+    def _coarsen(grid):
+        side = grid.shape[0] // 2
+        return grid.reshape(side, 2, side, 2).sum(axis=(1, 3))
+
+    def _level_for(self, x_range, y_range, view_cells):
+        """Coarsest level giving at least ``view_cells`` cells across the wider side of the view."""
+        span = max(x_range[1] - x_range[0], y_range[1] - y_range[0], 1e-9)
+        level = int(np.ceil(np.log2(view_cells * self.size / span)))
+        return min(max(level, 0), self.max_level)
+
+    def _cell_bounds(self, x_range, y_range, side):
+        cell_size = self.size / side
+        x_lo = int(np.clip(np.floor((x_range[0] - self.x0) / cell_size), 0, side))
+        x_hi = int(np.clip(np.ceil((x_range[1] - self.x0) / cell_size), 0, side))
+        y_lo = int(np.clip(np.floor((y_range[0] - self.y0) / cell_size), 0, side))
+        y_hi = int(np.clip(np.ceil((y_range[1] - self.y0) / cell_size), 0, side))
+        return x_lo, x_hi, y_lo, y_hi
+
+    def count_in_view(self, x_range, y_range):
+        """Number of points in the finest cells overlapping the view (an upper bound on the exact count)."""
+        side = 2 ** self.max_level
+        x_lo, x_hi, y_lo, y_hi = self._cell_bounds(x_range, y_range, side)
+        return int(self.levels[self.max_level][0][y_lo:y_hi, x_lo:x_hi].sum())
+
+    def aggregate(self, x_range, y_range, view_cells=DEFAULT_VIEW_CELLS):
+        """Per-cell count and metric means for the view, at a zoom-appropriate level.
+
+        Returns ``(x_centers, y_centers, counts, means)`` where ``counts`` is a
+        (rows, cols) array and ``means`` maps each metric to a same-shaped
+        array (NaN for empty cells).
+        """
+        level = self._level_for(x_range, y_range, view_cells)
+        side = 2 ** level
+        x_lo, x_hi, y_lo, y_hi = self._cell_bounds(x_range, y_range, side)
+        counts, sums, valid_counts = self.levels[level]
+
+        cell_size = self.size / side
+        x_centers = self.x0 + (np.arange(x_lo, x_hi) + 0.5) * cell_size
+        y_centers = self.y0 + (np.arange(y_lo, y_hi) + 0.5) * cell_size
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = {
+                name: sums[name][y_lo:y_hi, x_lo:x_hi] / valid_counts[name][y_lo:y_hi, x_lo:x_hi]
+                for name in self.metrics
+            }
+        return x_centers, y_centers, counts[y_lo:y_hi, x_lo:x_hi], means
+
+    def points_in_view(self, x_range, y_range):
+        """Raw points inside the view as a DataFrame (``x``, ``y``, metrics and any detail columns)."""
+        side = 2 ** self.max_level
+        x_lo, x_hi, y_lo, y_hi = self._cell_bounds(x_range, y_range, side)
+
+        # Each grid row of the view is one contiguous run of cell ids in the sorted order
+        runs = [
+            self._order[self._offsets[row * side + x_lo]:self._offsets[row * side + x_hi]]
+            for row in range(y_lo, y_hi)
+        ]
+        rows = np.concatenate(runs) if runs else np.empty(0, dtype=np.int64)
+        inside = (
+            (self.x[rows] >= x_range[0]) & (self.x[rows] <= x_range[1])
+            & (self.y[rows] >= y_range[0]) & (self.y[rows] <= y_range[1])
+        )
+        rows = rows[inside]
+
+        points_df = pd.DataFrame({"x": self.x[rows], "y": self.y[rows]})
+        for name in self.metrics:
+            points_df[name] = self.values[name][rows]
+        if self.detail is not None:
+            extra = [column for column in self.detail.columns if column not in points_df.columns]
+            points_df = pd.concat([points_df, self.detail.iloc[rows][extra].reset_index(drop=True)], axis="columns")
+        return points_df
+
+    def view(self, x_range=None, y_range=None, raw_point_limit=DEFAULT_RAW_POINT_LIMIT, view_cells=DEFAULT_VIEW_CELLS):
+        """``("points", DataFrame)`` when zoomed in enough, else ``("aggregate", aggregate(...))``."""
+        x_range = x_range or (self.x0, self.x0 + self.size)
+        y_range = y_range or (self.y0, self.y0 + self.size)
+        if self.count_in_view(x_range, y_range) <= raw_point_limit:
+            return "points", self.points_in_view(x_range, y_range)
+        return "aggregate", self.aggregate(x_range, y_range, view_cells)
+
+
+def listings_map(
+    pyramid,
+    color="gross_rent",
+    raw_point_limit=DEFAULT_RAW_POINT_LIMIT,
+    view_cells=DEFAULT_VIEW_CELLS,
+    frame_width=700,
+    frame_height=500,
+    title="SF Listings: Mean Gross Rent",
+):
+    """Zoom-aware OSM map of ``pyramid``: aggregated cells, or raw points with hover once zoomed in.
+
+    Aggregated cells are colored by the mean of ``color``; their hover shows
+    the mean of every metric and the point count of the cell.  Plotting
+    libraries are imported here, on first use.
+    """
+    import holoviews as hv
+    from holoviews import streams
+
+    def render(x_range, y_range):
+        kind, data = pyramid.view(x_range, y_range, raw_point_limit, view_cells)
+        if kind == "points":
+            hover_cols = [column for column in data.columns if column not in ("x", "y")]
+            return hv.Points(data, kdims=["x", "y"], vdims=hover_cols).opts(
+                color=color, cmap="viridis", colorbar=True, size=6, tools=["hover"],
+            )
+        x_centers, y_centers, counts, means = data
+        # The first value dimension drives the color; the other metrics and the count ride along for hover
+        metrics = [color] + [name for name in pyramid.metrics if name != color]
+        grids = [means[name] for name in metrics] + [counts]
+        return hv.Image(
+            (x_centers, y_centers, *grids), kdims=["x", "y"], vdims=metrics + ["count"],
+        ).opts(cmap="viridis", colorbar=True, alpha=0.8, tools=["hover"])
+
+    range_stream = streams.RangeXY()
+    aggregated = hv.DynamicMap(render, streams=[range_stream])
+    return (hv.element.tiles.OSM() * aggregated).opts(
+        hv.opts.Overlay(frame_width=frame_width, frame_height=frame_height, title=title)
+    )
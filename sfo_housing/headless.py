@@ -0,0 +1,195 @@
+"""Headless entry point: compute the tables and answers without plotting libraries.
+
+Usage::
+
+    python -m sfo_housing.headless            # tables + answers only, hvplot never imported
+    python -m sfo_housing.headless --plots    # also build the notebook's charts
+    python -m sfo_housing.headless --compare  # run both modes in fresh processes and compare
+    python -m sfo_housing.headless --profile trace.json  # per-stage timing/memory, Chrome trace
+
+Each run reports how long the analysis took, the peak resident memory of the
+process and whether any plotting library ended up loaded.  ``--compare`` also
+reports the import cost of ``sfo_housing`` (pandas and numpy included): the
+package is already imported by the time this module runs, so that figure is
+read from ``-X importtime`` of the fresh interpreters.  With ``--profile``,
+each compared mode writes its own trace (``trace.headless.json``,
+``trace.plots.json``).
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is reported as None
+    resource = None
+
+from sfo_housing.instrument import StageProfiler
+
+# Top level packages that make up the plotting stack
+PLOTTING_MODULES = ["hvplot", "holoviews", "bokeh", "panel", "geoviews"]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run(plots=False, use_cache=True, profiler=None):
+    """Run the analysis (and optionally build the charts); return a report dict."""
+    report = {"mode": "plots" if plots else "headless"}
+    profiler = profiler or StageProfiler(enabled=False)
+
+    from sfo_housing import analysis
+
+    start = time.perf_counter()
+    results = analysis.run_analysis(profiler=profiler, use_cache=use_cache)
+    report["analysis_seconds"] = time.perf_counter() - start
+
+    if plots:
+        start = time.perf_counter()
+        from sfo_housing import plots as charts
+        charts._hvplot()
+        report["import_plotting_seconds"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        charts.housing_units_bar(results.housing_units_by_year)
+        charts.prices_by_year_line(results.prices_square_foot_by_year)
+        charts.neighborhood_line(results.prices_by_year_by_neighborhood)
+        with profiler.stage("map_build") as stage:
+            stage.input(results.all_neighborhoods_df)
+            charts.neighborhood_map(results.all_neighborhoods_df)
+        report["plot_build_seconds"] = time.perf_counter() - start
+
+    report["peak_rss_mb"] = _peak_rss_mb()
+    report["plotting_modules_loaded"] = sorted(
+        name for name in PLOTTING_MODULES if name in sys.modules
+    )
+    report["answers"] = results.answers
+    return report
+
+
+def _import_seconds(importtime_output, package="sfo_housing"):
+    """Cumulative import time of ``package`` and its modules from ``-X importtime`` output."""
+    microseconds = 0
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line.split("|")
+        # Nested imports are indented; top-level ones already include their dependencies
+        name = fields[2][1:] if len(fields) == 3 else ""
+        if name == package or name.startswith(package + "."):
+            microseconds += int(fields[1])
+    return microseconds / 1e6
+
+
+def compare(use_cache=True, profile=None):
+    """Run each mode in a fresh interpreter so imports and memory are measured independently.
+
+    With ``profile``, each mode writes its own trace next to it, named after the mode.
+    """
+    reports = []
+    for mode, mode_args in (("headless", []), ("plots", ["--plots"])):
+        command = [sys.executable, "-X", "importtime", "-m", "sfo_housing.headless", "--json"] + mode_args
+        if not use_cache:
+            command.append("--no-cache")
+        if profile is not None:
+            command += ["--profile", str(profile.with_name(f"{profile.stem}.{mode}{profile.suffix}"))]
+        start = time.perf_counter()
+        completed = subprocess.run(command, capture_output=True, text=True)
+        process_seconds = time.perf_counter() - start
+        if completed.returncode != 0:
+            # e.g. the plotting stack is not installed on a batch box
+            errors = [line for line in completed.stderr.strip().splitlines() if not line.startswith("import time:")]
+            reports.append({"mode": mode, "error": (errors or ["unknown error"])[-1]})
+            continue
+        report = json.loads(completed.stdout)
+        report["import_analysis_seconds"] = _import_seconds(completed.stderr)
+        # Includes interpreter start-up and the pandas import triggered by the sfo_housing package
+        report["process_seconds"] = process_seconds
+        if profile is not None:
+            report["profile"] = command[-1]
+        reports.append(report)
+    return reports
+
+
+def _print_report(report):
+    print(f"Mode: {report['mode']}")
+    if "error" in report:
+        print(f"  failed: {report['error']}")
+        return
+    if "import_analysis_seconds" in report:
+        print(f"  import sfo_housing (pandas) : {report['import_analysis_seconds']:0.3f} s")
+    print(f"  analysis                    : {report['analysis_seconds']:0.3f} s")
+    if "import_plotting_seconds" in report:
+        print(f"  import plotting libraries   : {report['import_plotting_seconds']:0.3f} s")
+        print(f"  build charts                : {report['plot_build_seconds']:0.3f} s")
+    if "process_seconds" in report:
+        print(f"  whole process               : {report['process_seconds']:0.3f} s")
+    if report["peak_rss_mb"] is not None:
+        print(f"  peak RSS                    : {report['peak_rss_mb']:0.1f} MB")
+    print(f"  plotting modules loaded     : {', '.join(report['plotting_modules_loaded']) or 'none'}")
+    if "profile" in report:
+        print(f"  Chrome trace                : {report['profile']}")
+
+
+def _print_answers(answers):
+    print(f"Minimum average gross rent = {answers['min_average_gross_rent']:0.2f}")
+    for drop in answers["price_drops"]:
+        rent_change = drop["gross_rent_change"]
+        direction = "increased" if rent_change > 0 else "decreased"
+        print(
+            f"Average sale price per sqr foot dropped in {drop['year']} "
+            f"({drop['sale_price_sqr_foot_change']:0.2f}); gross rent {direction} by {abs(rent_change):0.2f}"
+        )
+    print(f"Highest gross rent: {answers['highest_gross_rent_neighborhood']}")
+    print(f"Highest sale price per sqr foot: {answers['highest_sale_price_sqr_foot_neighborhood']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the San Francisco housing analysis without plotting.")
+    parser.add_argument("--plots", action="store_true", help="also build the charts (imports hvplot)")
+    parser.add_argument("--compare", action="store_true", help="run headless and plot modes in separate processes")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the CSV instead of the cached snapshot")
+    parser.add_argument("--profile", type=Path, default=None,
+                        help="record per-stage timing/memory and write a Chrome trace to this path")
+    args = parser.parse_args(argv)
+
+    # Compared modes profile themselves in their own processes
+    profiler = StageProfiler(enabled=args.profile is not None and not args.compare)
+    if args.compare:
+        reports = compare(not args.no_cache, args.profile)
+    else:
+        reports = [run(args.plots, not args.no_cache, profiler)]
+
+    if profiler.enabled:
+        profiler.write_chrome_trace(args.profile)
+        profiler.write_json(args.profile.with_suffix(".stages.json"))
+
+    if args.json:
+        print(json.dumps(reports if args.compare else reports[0], indent=2))
+        return
+
+    answered = [report for report in reports if "answers" in report]
+    if answered:
+        _print_answers(answered[0]["answers"])
+    for report in reports:
+        print()
+        _print_report(report)
+
+    if profiler.enabled:
+        print()
+        profiler.print_table()
+        print(f"\nChrome trace written to {args.profile}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Typed, cached loader for ``sfo_neighborhoods_census_data.csv``.
+
+The first load parses the CSV with compact dtypes (categorical neighborhood,
+small int year, float32 metrics) and writes a columnar snapshot next to it.
+Later loads read the snapshot instead of re-parsing, as long as the source
+file has not changed.
+"""
+
+import hashlib
+import importlib.util
+import json
+from pathlib import Path
+
+import pandas as pd
+
+# Location of the census extract used by the notebook
+CENSUS_DATA_PATH = Path('./Resources/sfo_neighborhoods_census_data.csv')
+
+# Neighborhood centroids (Neighborhood, Lat, Lon)
+NEIGHBORHOOD_COORDINATES_PATH = Path('./Resources/neighborhoods_coordinates.csv')
+
+# Housing units per year (no header row: year, housing_units)
+HOUSING_PER_YEAR_PATH = Path('./Resources/housing_per_year.csv')
+
+# Per-neighborhood / per-year measures carried on every census row
+METRIC_COLUMNS = ["sale_price_sqr_foot", "housing_units", "gross_rent"]
+
+# Compact dtypes for the census columns
+#   - neighborhood: ~70 distinct labels repeated on every row -> categorical codes
+#   - year: 2010..2016 fits in an int16
+#   - metrics: float32 halves the memory but keeps only ~7 significant digits.  Housing units
+#     and gross rents are whole numbers well below 2**24 and stay exact; sale prices per sqr
+#     foot are rounded (relative error < 1e-7), which moves their means in about the 5th decimal
+CENSUS_DTYPES = {
+    "year": "int16",
+    "neighborhood": "category",
+    **{column: "float32" for column in METRIC_COLUMNS},
+}
+
+# Snapshots are written here unless the caller picks another folder
+DEFAULT_CACHE_DIR = Path('./Resources/.cache')
+
+# Bump when the snapshot layout or CENSUS_DTYPES change so old snapshots are ignored
+SNAPSHOT_VERSION = 1
+
+_HASH_BLOCK_SIZE = 1 << 20
+
+
+def _file_sha256(path):
+    # Hash the source in fixed size blocks so huge extracts are never fully in memory
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_format():
+    # Parquet needs pyarrow (or fastparquet); fall back to a pickle snapshot without it
+    if importlib.util.find_spec("pyarrow") or importlib.util.find_spec("fastparquet"):
+        return "parquet"
+    return "pickle"
+
+
+def _source_key(path):
+    # Absolute path of the source, so same-named files in different folders never share a snapshot
+    return str(path.resolve())
+
+
+def _snapshot_paths(path, cache_dir, snapshot_format):
+    suffix = ".parquet" if snapshot_format == "parquet" else ".pkl"
+    name = f"{path.stem}-{hashlib.sha256(_source_key(path).encode()).hexdigest()[:12]}"
+    data_path = cache_dir / (name + suffix)
+    meta_path = cache_dir / (name + ".meta.json")
+    return data_path, meta_path
+
+
+def _read_meta(meta_path):
+    try:
+        return json.loads(meta_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _snapshot_is_valid(path, meta, data_path, snapshot_format):
+    """Check a snapshot's metadata against the current source file.
+
+    A matching mtime and size is trusted without re-hashing.  If the mtime
+    moved (e.g. the file was touched or copied) the content hash decides, so
+    an unchanged file does not force a re-parse.
+    """
+    if meta is None or not data_path.exists():
+        return False
+    if meta.get("version") != SNAPSHOT_VERSION or meta.get("format") != snapshot_format:
+        return False
+    if meta.get("source") != _source_key(path):
+        return False
+
+    stat = path.stat()
+    if meta.get("size") != stat.st_size:
+        return False
+    if meta.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    return meta.get("sha256") == _file_sha256(path)
+
+
+def read_census_csv(path=CENSUS_DATA_PATH, **read_csv_kwargs):
+    """Parse the census CSV with the compact ``CENSUS_DTYPES``."""
+    return pd.read_csv(Path(path), dtype=CENSUS_DTYPES, **read_csv_kwargs)
+
+
+def load_neighborhood_coordinates(path=NEIGHBORHOOD_COORDINATES_PATH):
+    """Read the neighborhood centroids, indexed by ``Neighborhood``, dropping incomplete rows."""
+    return pd.read_csv(
+        Path(path),
+        dtype={"Neighborhood": str, "Lat": "float64", "Lon": "float64"},
+    ).dropna().set_index("Neighborhood")
+
+
+def load_housing_per_year(path=HOUSING_PER_YEAR_PATH):
+    """Read the housing units per year, indexed by ``year``."""
+    return pd.read_csv(
+        Path(path),
+        header=None,
+        names=["year", "housing_units"],
+        dtype={"year": "int16", "housing_units": "int64"},
+    ).set_index("year")
+
+
+def load_census_data(path=CENSUS_DATA_PATH, cache_dir=DEFAULT_CACHE_DIR, use_cache=True):
+    """Load the census data, using a columnar snapshot when one is up to date.
+
+    NaN rows are kept so callers can still audit and drop them the way the
+    notebook does.  Pass ``use_cache=False`` to always parse the CSV.
+    """
+    path = Path(path)
+    if not use_cache:
+        return read_census_csv(path)
+
+    cache_dir = Path(cache_dir)
+    snapshot_format = _snapshot_format()
+    data_path, meta_path = _snapshot_paths(path, cache_dir, snapshot_format)
+    meta = _read_meta(meta_path)
+
+    if _snapshot_is_valid(path, meta, data_path, snapshot_format):
+        if snapshot_format == "parquet":
+            census_df = pd.read_parquet(data_path)
+        else:
+            census_df = pd.read_pickle(data_path)
+
+        # Content was unchanged but the mtime moved: refresh it to skip re-hashing next time
+        stat = path.stat()
+        if meta["mtime_ns"] != stat.st_mtime_ns:
+            meta["mtime_ns"] = stat.st_mtime_ns
+            meta_path.write_text(json.dumps(meta))
+        return census_df
+
+    # Fingerprint the source before parsing so the metadata describes what was read
+    stat = path.stat()
+    source_sha256 = _file_sha256(path)
+    census_df = read_census_csv(path)
+
+    # Write the snapshot first, then its metadata, so a partial write is never trusted
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    if snapshot_format == "parquet":
+        census_df.to_parquet(data_path, index=False)
+    else:
+        census_df.to_pickle(data_path)
+
+    meta = {
+        "version": SNAPSHOT_VERSION,
+        "format": snapshot_format,
+        "source": _source_key(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": source_sha256,
+    }
+    meta_path.write_text(json.dumps(meta))
+    return census_df
@@ -0,0 +1,172 @@
+"""Sorted per-metric indexes for top-k, bottom-k and range queries.
+
+The notebook answers "which neighborhood has the highest gross rent?" with
+``idxmax()``: a full scan per question that only yields the single maximum.
+``MetricIndex`` keeps, per metric, the row positions sorted by value, so:
+
+- top-k / bottom-k is a slice of the sorted order (ties in row order)
+- a range on one metric is two ``np.searchsorted`` calls
+- a multi-metric range ("price per sqr foot between X and Y and rent above
+  Z") sizes every metric's range by binary search, walks only the most
+  selective one and checks the other bounds on those rows
+
+``update()`` folds changed or new rows in by deleting/inserting into the
+sorted arrays rather than re-sorting everything.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class MetricIndex:
+    """Sorted order of every metric column of ``frame`` (rows keyed by ``frame.index``)."""
+
+    def __init__(self, frame, metrics=None):
+        self.metrics = list(metrics) if metrics is not None else list(frame.columns)
+        self.frame = frame[self.metrics].astype(np.float64)
+        self._order = {}
+        self._sorted = {}
+        for metric in self.metrics:
+            values = self.frame[metric].to_numpy()
+            # NaNs are left out: they never satisfy a range and never rank
+            valid = np.flatnonzero(~np.isnan(values))
+            order = valid[np.argsort(values[valid], kind="stable")]
+            self._order[metric] = order
+            self._sorted[metric] = values[order]
+
+    def __len__(self):
+        return len(self.frame)
+
+    def _ties_by_row(self, metric, start, stop, k, descending):
+        # Rows tied on value come back in row order, matching idxmax/idxmin
+        positions = self._order[metric][start:stop]
+        values = self._sorted[metric][start:stop]
+        ranked = np.lexsort((positions, -values if descending else values))
+        return self.frame.iloc[positions[ranked][:k]]
+
+    def top_k(self, metric, k=1):
+        """The ``k`` rows with the largest ``metric``, largest first."""
+        sorted_values = self._sorted[metric]
+        if k <= 0 or not len(sorted_values):
+            return self.frame.iloc[:0]
+        # Everything at least as large as the k-th largest value, ties included
+        start = np.searchsorted(sorted_values, sorted_values[-min(k, len(sorted_values))], side="left")
+        return self._ties_by_row(metric, start, len(sorted_values), k, descending=True)
+
+    def bottom_k(self, metric, k=1):
+        """The ``k`` rows with the smallest ``metric``, smallest first."""
+        sorted_values = self._sorted[metric]
+        if k <= 0 or not len(sorted_values):
+            return self.frame.iloc[:0]
+        stop = np.searchsorted(sorted_values, sorted_values[min(k, len(sorted_values)) - 1], side="right")
+        return self._ties_by_row(metric, 0, stop, k, descending=False)
+
+    def _bounds(self, metric, low, high):
+        # Inclusive [low, high]; None leaves that side open
+        sorted_values = self._sorted[metric]
+        start = 0 if low is None else np.searchsorted(sorted_values, low, side="left")
+        stop = len(sorted_values) if high is None else np.searchsorted(sorted_values, high, side="right")
+        return int(start), int(max(stop, start))
+
+    def range_count(self, metric, low=None, high=None):
+        """Number of rows with ``low <= metric <= high`` (binary search only)."""
+        start, stop = self._bounds(metric, low, high)
+        return stop - start
+
+    def range_query(self, bounds):
+        """Rows satisfying every ``{metric: (low, high)}`` bound (inclusive, ``None`` = open).
+
+        Rows come back in ascending order of the most selective metric.
+        """
+        if not bounds:
+            return self.frame
+        spans = {metric: self._bounds(metric, low, high) for metric, (low, high) in bounds.items()}
+        driver = min(spans, key=lambda metric: spans[metric][1] - spans[metric][0])
+        start, stop = spans[driver]
+        positions = self._order[driver][start:stop]
+
+        keep = np.ones(len(positions), dtype=bool)
+        for metric, (low, high) in bounds.items():
+            if metric == driver:
+                continue
+            values = self.frame[metric].to_numpy()[positions]
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+            # NaN rows are absent from the driver range and fail every comparison above
+        return self.frame.iloc[positions[keep]]
+
+    def update(self, changed_df):
+        """Fold changed and new rows (same index type and metric columns) into the index.
+
+        Existing keys take the new values; unseen keys are appended.  Each
+        metric's sorted arrays are patched with a delete and a
+        ``searchsorted`` insert instead of a full sort.
+        """
+        changed_df = changed_df[self.metrics].astype(np.float64)
+        changed_df = changed_df[~changed_df.index.duplicated(keep="last")]
+        positions = self.frame.index.get_indexer(changed_df.index)
+        is_new = positions < 0
+
+        if is_new.any():
+            self.frame = pd.concat([self.frame, changed_df[is_new]])
+            positions[is_new] = np.arange(len(self.frame) - is_new.sum(), len(self.frame))
+        self.frame.iloc[positions[~is_new]] = changed_df[~is_new].to_numpy()
+
+        for metric in self.metrics:
+            order = self._order[metric]
+            stale = np.isin(order, positions)
+            order = order[~stale]
+            sorted_values = self._sorted[metric][~stale]
+
+            new_values = changed_df[metric].to_numpy()
+            valid = ~np.isnan(new_values)
+            insert_values = new_values[valid]
+            insert_positions = positions[valid]
+            # Sort the (few) new entries so ties keep row order, then insert in one pass
+            insert_order = np.lexsort((insert_positions, insert_values))
+            insert_values = insert_values[insert_order]
+            insert_positions = insert_positions[insert_order]
+            at = np.searchsorted(sorted_values, insert_values, side="left")
+            # Within a run of equal values the rows are in row order: insert at the row's place in the run
+            stop = np.searchsorted(sorted_values, insert_values, side="right")
+            for entry in np.flatnonzero(stop > at):
+                at[entry] += np.searchsorted(order[at[entry]:stop[entry]], insert_positions[entry])
+            self._order[metric] = np.insert(order, at, insert_positions)
+            self._sorted[metric] = np.insert(sorted_values, at, insert_values)
+        return self
+
+
+class YearScopedIndex:
+    """:class:`MetricIndex` over the (neighborhood, year) means, overall and per year.
+
+    Built from a frame indexed by (neighborhood, year) such as
+    ``prices_by_year_by_neighborhood``.  ``for_year(year)`` scopes queries to
+    one year; ``overall`` spans every (neighborhood, year) row.
+    """
+
+    def __init__(self, neighborhood_year_df, metrics=None):
+        self.metrics = list(metrics) if metrics is not None else list(neighborhood_year_df.columns)
+        self.overall = MetricIndex(neighborhood_year_df, self.metrics)
+        self._by_year = {}
+        for year, year_df in neighborhood_year_df.groupby(level="year", sort=True):
+            self._by_year[int(year)] = MetricIndex(year_df.droplevel("year"), self.metrics)
+
+    @property
+    def years(self):
+        return sorted(self._by_year)
+
+    def for_year(self, year):
+        return self._by_year[int(year)]
+
+    def update(self, changed_df):
+        """Fold changed (neighborhood, year) rows in; only the affected years are touched."""
+        self.overall.update(changed_df)
+        for year, year_df in changed_df.groupby(level="year", sort=True):
+            year_df = year_df.droplevel("year")
+            if int(year) in self._by_year:
+                self._by_year[int(year)].update(year_df)
+            else:
+                self._by_year[int(year)] = MetricIndex(year_df, self.metrics)
+        return self
@@ -0,0 +1,166 @@
+"""Shared neighborhood dictionary: normalized names mapped to integer IDs.
+
+The census and coordinates CSVs spell some neighborhoods differently (e.g.
+``"Bernal Heights "`` with a trailing space in the census data), so the
+notebook's label-based ``pd.concat`` silently drops them.  Both datasets are
+encoded through one ``NeighborhoodDictionary``; the location join then becomes
+an integer array lookup, and the keys that still do not match are reported
+instead of vanishing.
+"""
+
+import re
+import unicodedata
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Result of join_by_id
+#   - joined_df: one row per neighborhood present in both inputs
+#   - missing_coordinates: census neighborhoods with no coordinates
+#   - missing_census: coordinate neighborhoods with no census data
+#   - duplicate_coordinates: neighborhoods given by several coordinate rows (their coordinates are averaged)
+#   - duplicate_values: neighborhoods given by several value rows (their values are averaged)
+LocationJoin = namedtuple(
+    "LocationJoin",
+    ["joined_df", "missing_coordinates", "missing_census", "duplicate_coordinates", "duplicate_values"],
+)
+
+_WHITESPACE = re.compile(r"\s+")
+_SPACED_SEPARATORS = re.compile(r"\s*([/\-])\s*")
+
+
+def normalize_neighborhood(name):
+    """Canonical key for a neighborhood name.
+
+    Unicode-normalizes, trims and collapses whitespace, drops spaces around
+    ``/`` and ``-`` and case-folds, so ``"Van Ness/ Civic Center"`` and
+    ``"van ness / civic center "`` share a key.
+    """
+    key = unicodedata.normalize("NFKC", str(name))
+    key = _WHITESPACE.sub(" ", key).strip()
+    key = _SPACED_SEPARATORS.sub(r"\1", key)
+    return key.casefold()
+
+
+class NeighborhoodDictionary:
+    """Normalized neighborhood keys with stable integer IDs and display labels."""
+
+    def __init__(self):
+        self._ids = {}
+        self.keys = []
+        self.labels = []
+
+    @classmethod
+    def from_keys(cls, keys, labels):
+        """Rebuild a dictionary from its ``keys`` and ``labels`` (ID = position), without re-normalizing."""
+        dictionary = cls()
+        dictionary.keys = [str(key) for key in keys]
+        dictionary.labels = [str(label) for label in labels]
+        dictionary._ids = {key: neighborhood_id for neighborhood_id, key in enumerate(dictionary.keys)}
+        return dictionary
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, name):
+        return normalize_neighborhood(name) in self._ids
+
+    def add(self, name):
+        """ID of ``name``, assigning the next ID if its normalized key is new."""
+        key = normalize_neighborhood(name)
+        neighborhood_id = self._ids.get(key)
+        if neighborhood_id is None:
+            neighborhood_id = len(self.keys)
+            self._ids[key] = neighborhood_id
+            self.keys.append(key)
+            # The first spelling seen, tidied up, is used for display
+            self.labels.append(_WHITESPACE.sub(" ", str(name)).strip())
+        return neighborhood_id
+
+    def encode(self, names, add=True):
+        """Integer IDs for an array of names; unknown names get -1 unless ``add`` is set.
+
+        Only the distinct names are normalized and looked up, so encoding a
+        column of millions of rows costs one pass plus work per unique label.
+        """
+        codes, uniques = pd.factorize(pd.Index(names))
+        if add:
+            unique_ids = np.array([self.add(name) for name in uniques], dtype=np.int64)
+        else:
+            unique_ids = np.array(
+                [self._ids.get(normalize_neighborhood(name), -1) for name in uniques], dtype=np.int64
+            )
+        # Missing names (NaN) have code -1 and stay -1
+        return np.where(codes >= 0, unique_ids[codes] if len(unique_ids) else -1, -1)
+
+    def decode(self, ids):
+        """Display labels for an array of IDs."""
+        labels = np.asarray(self.labels, dtype=object)
+        return labels[np.asarray(ids, dtype=np.int64)]
+
+
+def join_by_id(dictionary, coordinates_df, neighborhood_values_df):
+    """Join per-neighborhood values to coordinates through ``dictionary`` IDs.
+
+    ``coordinates_df`` is indexed by neighborhood with ``Lat``/``Lon``
+    columns; ``neighborhood_values_df`` is indexed by neighborhood (e.g.
+    ``all_neighborhood_info_df``).  Returns a :data:`LocationJoin` whose
+    ``joined_df`` has a ``Neighborhood`` column followed by ``Lat``, ``Lon``
+    and the value columns, one row per ID in order of first appearance in
+    ``neighborhood_values_df``.  Rows of either input whose names share an
+    ID (spelling variants) are averaged and reported as duplicates.
+    """
+    coordinate_ids = dictionary.encode(coordinates_df.index)
+    value_ids = dictionary.encode(neighborhood_values_df.index)
+    n_ids = len(dictionary)
+
+    # Coordinates averaged into ID-indexed arrays; the join is then a gather by value ID
+    coordinate_counts = np.bincount(coordinate_ids, minlength=n_ids)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        lat = np.bincount(coordinate_ids, coordinates_df["Lat"].to_numpy(dtype=np.float64), n_ids) / coordinate_counts
+        lon = np.bincount(coordinate_ids, coordinates_df["Lon"].to_numpy(dtype=np.float64), n_ids) / coordinate_counts
+
+    value_counts = np.bincount(value_ids, minlength=n_ids)
+    values = neighborhood_values_df.reset_index(drop=True)
+    if (value_counts > 1).any():
+        values = values.groupby(value_ids, sort=False).mean()
+        value_ids = values.index.to_numpy()
+        values = values.reset_index(drop=True)
+
+    has_coordinates = coordinate_counts > 0
+    has_values = value_counts > 0
+
+    matched = has_coordinates[value_ids]
+    matched_ids = value_ids[matched]
+    joined_df = pd.DataFrame(
+        {
+            "Neighborhood": dictionary.decode(matched_ids),
+            "Lat": lat[matched_ids],
+            "Lon": lon[matched_ids],
+        }
+    )
+    values = values[matched].reset_index(drop=True)
+    joined_df = pd.concat([joined_df, values], axis="columns")
+
+    return LocationJoin(
+        joined_df,
+        missing_coordinates=sorted(dictionary.decode(np.flatnonzero(has_values & ~has_coordinates))),
+        missing_census=sorted(dictionary.decode(np.flatnonzero(has_coordinates & ~has_values))),
+        duplicate_coordinates=sorted(dictionary.decode(np.flatnonzero(coordinate_counts > 1))),
+        duplicate_values=sorted(dictionary.decode(np.flatnonzero(value_counts > 1))),
+    )
+
+
+def unmatched_report(location_join):
+    """Human readable list of the keys that did not join or were given more than once."""
+    lines = []
+    if location_join.missing_coordinates:
+        lines.append("Census neighborhoods without coordinates: " + ", ".join(location_join.missing_coordinates))
+    if location_join.missing_census:
+        lines.append("Coordinate neighborhoods without census data: " + ", ".join(location_join.missing_census))
+    if location_join.duplicate_coordinates:
+        lines.append("Neighborhoods with several coordinate rows: " + ", ".join(location_join.duplicate_coordinates))
+    if location_join.duplicate_values:
+        lines.append("Neighborhoods with several census rows: " + ", ".join(location_join.duplicate_values))
+    return "\n".join(lines) or "All neighborhoods matched"
@@ -0,0 +1,182 @@
+"""Normalized census storage: a year dimension table plus a per-neighborhood fact table.
+
+``housing_units`` and ``gross_rent`` are the same for every neighborhood in a
+given year, yet the census CSV repeats them on every row and the notebook
+averages them back out with ``groupby("year").mean()``.  ``NormalizedCensus``
+keeps each year-level column once per year (``years_df``) and only the
+per-neighborhood measures per row (``facts_df``: year, neighborhood,
+``sale_price_sqr_foot``).  The year aggregations of year-level columns become
+direct lookups in ``years_df``; the original wide rows are rebuilt on demand
+by ``joined()``.  The few rows whose year-level value was NaN are remembered
+by position (``null_rows``), so ``joined()`` and ``dropna()`` still match the
+wide frame exactly.
+
+``Resources/housing_per_year.csv`` holds the same housing units per year and
+can be used as the authoritative source for that column (the census copy is
+stored as float32).
+"""
+
+import numpy as np
+import pandas as pd
+
+from sfo_housing.loader import METRIC_COLUMNS
+
+# Columns expected to be constant within a year in the census extract
+YEAR_LEVEL_COLUMNS = ["housing_units", "gross_rent"]
+
+
+def _year_codes(years):
+    values, codes = np.unique(np.asarray(years), return_inverse=True)
+    return values, codes
+
+
+def year_level_columns(census_df, candidates=YEAR_LEVEL_COLUMNS, stats=None):
+    """The ``candidates`` whose non-NaN values never vary within a year.
+
+    Reads the per-year min/max from the ingest
+    :class:`~sfo_housing.column_stats.TableStats` when they were collected
+    with ``group_by=("year",)``.  Note that those
+    describe complete rows only, so pass ``stats`` for data that has been
+    through ``dropna``.
+    """
+    constant = []
+    if stats is not None and "year" in stats.groups:
+        per_year = stats.groups["year"]
+        for column in candidates:
+            if (column, "min") in per_year and (per_year[(column, "min")] == per_year[(column, "max")]).all():
+                constant.append(column)
+        return constant
+
+    years, codes = _year_codes(census_df["year"])
+    for column in candidates:
+        values = census_df[column].to_numpy(dtype=np.float64)
+        valid = ~np.isnan(values)
+        low = np.full(len(years), np.inf)
+        high = np.full(len(years), -np.inf)
+        np.minimum.at(low, codes[valid], values[valid])
+        np.maximum.at(high, codes[valid], values[valid])
+        if (low == high).all():
+            constant.append(column)
+    return constant
+
+
+class NormalizedCensus:
+    """Year dimension table (indexed by ``year``) plus a compact per-row fact table.
+
+    ``null_rows`` maps a year-level column to the fact-table row positions
+    where the census value was NaN (columns without NaNs are left out).
+    """
+
+    def __init__(self, years_df, facts_df, null_rows=None):
+        self.years_df = years_df
+        self.facts_df = facts_df
+        self.null_rows = dict(null_rows or {})
+
+    @classmethod
+    def from_frame(cls, census_df, year_columns=None, housing_per_year_df=None, stats=None):
+        """Split census rows into the dimension and fact tables.
+
+        ``year_columns`` defaults to the :data:`YEAR_LEVEL_COLUMNS` that are
+        actually constant within every year of ``census_df``; any other metric
+        stays in the fact table.  ``housing_per_year_df`` (see
+        :func:`~sfo_housing.loader.load_housing_per_year`) replaces the
+        census copy of ``housing_units`` when given.
+        """
+        if year_columns is None:
+            year_columns = year_level_columns(census_df, stats=stats)
+        year_columns = list(year_columns)
+
+        years, codes = _year_codes(census_df["year"])
+        dimension = {}
+        null_rows = {}
+        for column in year_columns:
+            values = census_df[column].to_numpy()
+            valid = ~pd.isna(values)
+            if not valid.all():
+                null_rows[column] = np.flatnonzero(~valid)
+            # Any non-NaN row of a year carries that year's value; take the last one seen
+            column_values = np.full(len(years), np.nan, dtype=np.float64)
+            column_values[codes[valid]] = values[valid]
+            # A year with no value at all needs the NaN, so integer input stays float64 then
+            dtype = census_df[column].dtype
+            if dtype.kind == "f" or not np.isnan(column_values).any():
+                column_values = column_values.astype(dtype)
+            dimension[column] = column_values
+        years_df = pd.DataFrame(dimension, index=pd.Index(years.astype(census_df["year"].dtype), name="year"))
+        if housing_per_year_df is not None and "housing_units" in years_df.columns:
+            years_df["housing_units"] = housing_per_year_df["housing_units"].reindex(years_df.index).to_numpy()
+
+        fact_columns = [column for column in census_df.columns if column not in year_columns]
+        return cls(years_df, census_df[fact_columns].reset_index(drop=True), null_rows)
+
+    @property
+    def year_columns(self):
+        return list(self.years_df.columns)
+
+    @property
+    def fact_metrics(self):
+        return [column for column in self.facts_df.columns if column in METRIC_COLUMNS]
+
+    def memory_usage(self, deep=False):
+        """Bytes held by both tables."""
+        return int(
+            self.years_df.memory_usage(index=True, deep=deep).sum()
+            + self.facts_df.memory_usage(index=True, deep=deep).sum()
+        )
+
+    def dropna(self):
+        """Equivalent of ``census_df.dropna()``.
+
+        Drops rows with a NaN in the fact table, rows of years without a
+        dimension value and the rows recorded in ``null_rows``.
+        """
+        complete_years = self.years_df.index[self.years_df.notna().all(axis=1)]
+        keep = self.facts_df.notna().all(axis=1).to_numpy() & self.facts_df["year"].isin(complete_years).to_numpy()
+        for positions in self.null_rows.values():
+            keep[positions] = False
+        return NormalizedCensus(self.years_df.loc[complete_years], self.facts_df[keep].reset_index(drop=True))
+
+    def joined(self, columns=None):
+        """The wide census rows, rebuilt on demand by gathering the year-level columns per row."""
+        columns = list(columns) if columns is not None else list(self.facts_df.columns) + self.year_columns
+        positions = self.years_df.index.get_indexer(self.facts_df["year"])
+        joined_df = pd.DataFrame(index=self.facts_df.index)
+        for column in columns:
+            if column in self.years_df.columns:
+                values = self.years_df[column].to_numpy()
+                joined = np.where(positions >= 0, values[positions], np.nan)
+                if column in self.null_rows:
+                    joined[self.null_rows[column]] = np.nan
+                # Integer columns can only go back to their dtype when no NaN was restored
+                if values.dtype.kind == "f" or not np.isnan(joined).any():
+                    joined = joined.astype(values.dtype, copy=False)
+                joined_df[column] = joined
+            else:
+                joined_df[column] = self.facts_df[column]
+        return joined_df
+
+    def year_mean(self, metrics=None):
+        """Equivalent of ``groupby("year").mean()``.
+
+        Year-level columns are read straight from ``years_df``; only fact
+        metrics are aggregated, with one bincount over the year codes.
+        """
+        metrics = list(metrics) if metrics is not None else self.fact_metrics + self.year_columns
+        years, codes = _year_codes(self.facts_df["year"])
+        year_mean_df = pd.DataFrame(index=pd.Index(years, name="year"))
+        for metric in metrics:
+            if metric in self.years_df.columns:
+                year_mean_df[metric] = self.years_df[metric].reindex(year_mean_df.index).to_numpy()
+            else:
+                values = self.facts_df[metric].to_numpy(dtype=np.float64)
+                valid = ~np.isnan(values)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    year_mean_df[metric] = (
+                        np.bincount(codes[valid], weights=values[valid], minlength=len(years))
+                        / np.bincount(codes[valid], minlength=len(years))
+                    )
+        return year_mean_df
+
+    def housing_units_by_year(self):
+        """``housing_units`` per year: a lookup in the dimension table."""
+        return self.years_df[["housing_units"]]
@@ -0,0 +1,321 @@
+"""The analysis as a declared stage DAG with fingerprinted, persisted intermediates.
+
+Usage::
+
+    python -m sfo_housing.pipeline                  # answers, reusing every cached stage
+    python -m sfo_housing.pipeline --target map     # also build the neighborhood map HTML
+    python -m sfo_housing.pipeline --force clean    # recompute clean and everything downstream
+
+The notebook is a linear script: any change means re-running every cell from
+``read_csv`` on.  Here each stage declares its inputs (other stages or source
+files) and its fingerprint is a hash of:
+
+- the source code of the stage and of the modules it calls
+- the fingerprints of its upstream stages
+- the content hash of the source files it reads (re-hashed only when a
+  file's size or mtime moves)
+
+Outputs are pickled under ``Resources/.cache/pipeline/<stage>/<fingerprint>.pkl``.
+A rerun recomputes only the stages whose fingerprint changed (i.e. the ones
+downstream of an edited stage or a changed CSV) and does not even load a cached
+output unless a stage that has to run needs it.  Stages whose inputs are ready
+run concurrently on a thread pool (the year and neighborhood rollups, the
+location join and the answers overlap where the DAG allows).
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import sys
+import tempfile
+import time
+import uuid
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from sfo_housing import analysis, column_stats, cube, loader, neighborhoods, plots
+from sfo_housing.instrument import StageProfiler
+from sfo_housing.loader import CENSUS_DATA_PATH, DEFAULT_CACHE_DIR, NEIGHBORHOOD_COORDINATES_PATH, _file_sha256
+
+DEFAULT_PIPELINE_CACHE_DIR = DEFAULT_CACHE_DIR / "pipeline"
+
+# Bump to invalidate every persisted intermediate (e.g. after a pandas upgrade changes pickles)
+PIPELINE_CACHE_VERSION = 1
+
+# One node of the DAG
+#   - name: stage name, also the key of its output
+#   - func: called with the outputs of ``inputs`` (stages) and the values of ``sources``, in that order
+#   - inputs: names of upstream stages
+#   - sources: names of the file parameters the stage reads (fingerprinted by content)
+#   - modules: modules whose source is part of the code fingerprint
+#   - persist: whether the output is pickled to the cache
+Stage = namedtuple("Stage", ["name", "func", "inputs", "sources", "modules", "persist"])
+
+# Outcome of Pipeline.run
+#   - outputs: stage name -> output, for the requested targets
+#   - computed / loaded / skipped: stage names that ran, were read from the cache, or were not needed
+PipelineRun = namedtuple("PipelineRun", ["outputs", "computed", "loaded", "skipped"])
+
+
+def _ingest(census_path):
+    raw_df = analysis.ingest(census_path)
+    return raw_df, column_stats.collect_stats(raw_df)
+
+
+def _clean(ingested):
+    raw_df, stats = ingested
+    return analysis.clean(raw_df, stats)
+
+
+def _aggregate(cleaned):
+    return cube.AggregationCube.from_frame(cleaned[1])
+
+
+def _year_rollups(aggregate):
+    return analysis.year_rollups(aggregate)
+
+
+def _neighborhood_rollups(aggregate):
+    return analysis.neighborhood_rollups(aggregate)
+
+
+def _location_join(rollups, coordinates_path):
+    coordinates_df = loader.load_neighborhood_coordinates(coordinates_path)
+    return analysis.join_locations(coordinates_df, rollups[1])
+
+
+def _map(location_join):
+    # Rendered to standalone HTML so the persisted output does not depend on pickling chart objects
+    import hvplot
+
+    chart = plots.neighborhood_map(location_join.joined_df)
+    with tempfile.TemporaryDirectory() as scratch:
+        path = Path(scratch) / "neighborhood_map.html"
+        hvplot.save(chart, path)
+        return path.read_text()
+
+
+def _answers(year_rollups, location_join):
+    return analysis.answer_questions(year_rollups[1], location_join.joined_df)
+
+
+# The notebook's stages.  ``aggregate`` (the single-pass cube) sits between
+# ``clean`` and the rollups so both rollups share it.
+STAGES = [
+    Stage("ingest", _ingest, [], ["census_path"], [analysis, column_stats, loader], True),
+    Stage("clean", _clean, ["ingest"], [], [analysis], True),
+    Stage("aggregate", _aggregate, ["clean"], [], [cube, neighborhoods], True),
+    Stage("year_rollups", _year_rollups, ["aggregate"], [], [analysis, cube], True),
+    Stage("neighborhood_rollups", _neighborhood_rollups, ["aggregate"], [], [analysis, cube], True),
+    Stage("location_join", _location_join, ["neighborhood_rollups"], ["coordinates_path"],
+          [analysis, loader, neighborhoods], True),
+    Stage("map", _map, ["location_join"], [], [plots], True),
+    Stage("answers", _answers, ["year_rollups", "location_join"], [], [analysis], True),
+]
+
+# Stages run when no targets are given (the map needs the plotting stack)
+DEFAULT_TARGETS = ["answers"]
+
+
+class Pipeline:
+    """Runs :data:`STAGES` (or any list of :data:`Stage`) with fingerprinted caching."""
+
+    def __init__(
+        self,
+        stages=STAGES,
+        cache_dir=DEFAULT_PIPELINE_CACHE_DIR,
+        workers=None,
+        profiler=None,
+        **sources,
+    ):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = Path(cache_dir)
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.profiler = profiler or StageProfiler(enabled=False)
+        self.sources = {"census_path": CENSUS_DATA_PATH, "coordinates_path": NEIGHBORHOOD_COORDINATES_PATH, **sources}
+        self._code_hashes = {}
+        self._source_hashes = {}
+
+    def _code_hash(self, stage):
+        if stage.name not in self._code_hashes:
+            digest = hashlib.sha256(inspect.getsource(stage.func).encode())
+            for module in sorted(stage.modules, key=lambda module: module.__name__):
+                digest.update(module.__name__.encode())
+                digest.update(inspect.getsource(module).encode())
+            self._code_hashes[stage.name] = digest.hexdigest()
+        return self._code_hashes[stage.name]
+
+    def _source_hash(self, name):
+        """Content hash of a source file, re-hashed only when its size or mtime moved."""
+        if name in self._source_hashes:
+            return self._source_hashes[name]
+        path = Path(self.sources[name]).resolve()
+        stat = path.stat()
+        known_path = self.cache_dir / "sources.json"
+        try:
+            known = json.loads(known_path.read_text())
+        except (OSError, ValueError):
+            known = {}
+        entry = known.get(str(path), {})
+        if entry.get("size") != stat.st_size or entry.get("mtime_ns") != stat.st_mtime_ns:
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_sha256(path)}
+            known[str(path)] = entry
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            known_path.write_text(json.dumps(known))
+        # Only the content goes into fingerprints: touching or copying a file does not invalidate anything
+        self._source_hashes[name] = entry["sha256"]
+        return entry["sha256"]
+
+    def fingerprints(self):
+        """Stage name -> fingerprint, computed in dependency order without running anything."""
+        fingerprints = {}
+        for name in self.order(self.stages):
+            stage = self.stages[name]
+            fingerprints[name] = hashlib.sha256(json.dumps({
+                "version": PIPELINE_CACHE_VERSION,
+                "stage": name,
+                "code": self._code_hash(stage),
+                "inputs": [fingerprints[upstream] for upstream in stage.inputs],
+                "sources": [self._source_hash(source) for source in stage.sources],
+            }, sort_keys=True).encode()).hexdigest()
+        return fingerprints
+
+    def order(self, names):
+        """``names`` and everything upstream of them, in dependency order."""
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage {name!r} depends on itself")
+            visiting.add(name)
+            for upstream in self.stages[name].inputs:
+                visit(upstream)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for name in names:
+            visit(name)
+        return ordered
+
+    def _cache_path(self, name, fingerprint):
+        return self.cache_dir / name / f"{fingerprint}.pkl"
+
+    def _load(self, name, fingerprint):
+        with open(self._cache_path(name, fingerprint), "rb") as cached:
+            return pickle.load(cached)
+
+    def _store(self, name, fingerprint, output):
+        stage_dir = self.cache_dir / name
+        stage_dir.mkdir(parents=True, exist_ok=True)
+        # Write under a unique name then rename, so a crash or a concurrent run never leaves a partial file
+        partial = stage_dir / f".{fingerprint}.{uuid.uuid4().hex}.partial"
+        with open(partial, "wb") as cached:
+            pickle.dump(output, cached, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(partial, self._cache_path(name, fingerprint))
+        # Only the latest output of each stage is kept
+        for stale in stage_dir.glob("*.pkl"):
+            if stale.stem != fingerprint:
+                stale.unlink(missing_ok=True)
+
+    def run(self, targets=None, force=()):
+        """Produce ``targets`` (default :data:`DEFAULT_TARGETS`); return a :data:`PipelineRun`.
+
+        ``force`` names stages to recompute even if cached; everything
+        downstream of them is recomputed too.
+        """
+        targets = list(targets or DEFAULT_TARGETS)
+        self._source_hashes = {}
+        fingerprints = self.fingerprints()
+        order = self.order(targets)
+
+        # A stage is stale if it was forced, is not cached, or any upstream stage is stale
+        stale = set()
+        for name in order:
+            stage = self.stages[name]
+            if (
+                name in force
+                or any(upstream in stale for upstream in stage.inputs)
+                or not stage.persist
+                or not self._cache_path(name, fingerprints[name]).exists()
+            ):
+                stale.add(name)
+
+        # Cached outputs are only loaded when a target or a stale stage needs them
+        needed = set(targets)
+        for name in reversed(order):
+            if name in stale:
+                needed.update(self.stages[name].inputs)
+
+        loaded = [name for name in order if name in needed and name not in stale]
+        outputs = {name: self._load(name, fingerprints[name]) for name in loaded}
+        computed = []
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            pending = [name for name in order if name in stale]
+            running = {}
+            while pending or running:
+                for name in list(pending):
+                    if all(upstream in outputs for upstream in self.stages[name].inputs):
+                        pending.remove(name)
+                        running[pool.submit(self._run_stage, name, fingerprints[name], outputs)] = name
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    outputs[name] = future.result()
+                    computed.append(name)
+
+        skipped = [name for name in self.stages if name not in computed and name not in loaded]
+        return PipelineRun({name: outputs[name] for name in targets}, computed, loaded, skipped)
+
+    def _run_stage(self, name, fingerprint, outputs):
+        stage = self.stages[name]
+        args = [outputs[upstream] for upstream in stage.inputs]
+        args += [self.sources[source] for source in stage.sources]
+        with self.profiler.stage(name):
+            output = stage.func(*args)
+        if stage.persist:
+            self._store(name, fingerprint, output)
+        return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the analysis DAG, reusing cached stage outputs.")
+    parser.add_argument("--target", action="append", choices=[stage.name for stage in STAGES],
+                        help="stage to produce (repeatable; default: answers)")
+    parser.add_argument("--force", action="append", default=[], choices=[stage.name for stage in STAGES],
+                        help="recompute this stage and everything downstream (repeatable)")
+    parser.add_argument("--cache-dir", type=Path, default=DEFAULT_PIPELINE_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None, help="stages run concurrently")
+    parser.add_argument("--map-output", type=Path, default=Path("neighborhood_map.html"),
+                        help="where the map target's HTML is written")
+    parser.add_argument("--profile", type=Path, default=None, help="write a Chrome trace of the stages that ran")
+    args = parser.parse_args(argv)
+
+    profiler = StageProfiler(enabled=args.profile is not None, trace_memory=False)
+    pipeline = Pipeline(cache_dir=args.cache_dir, workers=args.workers, profiler=profiler)
+
+    start = time.perf_counter()
+    run = pipeline.run(args.target, force=args.force)
+    elapsed = time.perf_counter() - start
+
+    print(f"computed: {', '.join(run.computed) or 'nothing'}")
+    print(f"loaded from cache: {', '.join(run.loaded) or 'nothing'}")
+    print(f"finished in {elapsed:0.3f} s")
+    if "answers" in run.outputs:
+        json.dump(run.outputs["answers"], sys.stdout, indent=2)
+        print()
+    if "map" in run.outputs:
+        args.map_output.write_text(run.outputs["map"])
+        print(f"map written to {args.map_output}")
+    if args.profile is not None:
+        profiler.write_chrome_trace(args.profile)
+
+
+if __name__ == "__main__":
+    main()
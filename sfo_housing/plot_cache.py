@@ -0,0 +1,113 @@
+"""Content-addressed, size-bounded on-disk cache of rendered charts.
+
+A chart is identified by a hash of its builder name, the source of the
+builder's module (the builder, its helpers and kwargs), the data passed to it
+and its plot options (:data:`sfo_housing.plots.CHART_OPTIONS`).  If neither
+the code, the aggregated data nor the options changed, the rendered HTML/PNG
+is copied out of the cache instead of being rebuilt.  The cache is bounded in
+bytes and evicts least recently used entries (by file mtime, refreshed on
+every hit).
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_PLOT_CACHE_DIR = Path('./Resources/.cache/plots')
+
+# 256 MB of rendered charts by default
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump to invalidate every cached chart (e.g. after a plotting library upgrade changes the output)
+PLOT_CACHE_VERSION = 1
+
+
+def _update_digest(digest, value):
+    """Feed ``value`` into ``digest`` in a type-aware, order-stable way."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        digest.update(type(value).__name__.encode())
+        frame = value.to_frame() if isinstance(value, pd.Series) else value
+        digest.update(json.dumps([str(column) for column in frame.columns]).encode())
+        digest.update(json.dumps([str(name) for name in frame.index.names]).encode())
+        digest.update(json.dumps([str(dtype) for dtype in frame.dtypes]).encode())
+        digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    else:
+        digest.update(json.dumps(value, sort_keys=True, default=repr).encode())
+
+
+def chart_key(chart, args, options=(), builder=None):
+    """Content hash of a chart builder name, its code, its data arguments and its plot options.
+
+    ``builder`` is the chart function; like the pipeline's stage hashes, the
+    source of its module is part of the key, so editing the builder or a
+    helper it calls invalidates the cached charts.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{PLOT_CACHE_VERSION}:{chart}".encode())
+    if builder is not None:
+        # The whole module, so the helpers and kwargs the builder uses are covered too
+        digest.update(inspect.getsource(inspect.getmodule(builder)).encode())
+    for value in args:
+        _update_digest(digest, value)
+    for value in options:
+        _update_digest(digest, value)
+    return digest.hexdigest()
+
+
+class PlotCache:
+    """Rendered chart files stored under their content key, with LRU eviction."""
+
+    def __init__(self, cache_dir=DEFAULT_PLOT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def _path(self, key, fmt):
+        return self.cache_dir / f"{key}.{fmt}"
+
+    def get(self, key, fmt, destination):
+        """Copy a cached chart to ``destination``; return False on a cache miss."""
+        cached = self._path(key, fmt)
+        try:
+            shutil.copyfile(cached, destination)
+            # Mark as recently used
+            os.utime(cached)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def put(self, key, fmt, source):
+        """Store the rendered chart at ``source`` under ``key`` and evict down to ``max_bytes``."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Copy under a unique name then rename, so concurrent workers never see a partial file
+        partial = self.cache_dir / f".{key}.{uuid.uuid4().hex}.partial"
+        shutil.copyfile(source, partial)
+        os.replace(partial, self._path(key, fmt))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``."""
+        entries = []
+        for path in self.cache_dir.glob("*.*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # removed by another worker
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
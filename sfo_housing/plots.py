@@ -0,0 +1,103 @@
+"""The notebook's charts, built from :mod:`sfo_housing.analysis` results.
+
+hvplot (and with it holoviews, bokeh, panel and, for the map, geoviews) is
+only imported when a chart function is first called, so importing this module
+costs nothing for headless runs.
+"""
+
+from sfo_housing.series_store import NeighborhoodSeriesStore, neighborhood_line_plot
+
+# Keyword arguments for each chart, shared by the notebook, batch export and the plot cache
+HOUSING_UNITS_BAR_KWARGS = dict(
+    xlabel="Year",
+    ylabel="Housing Units",
+    title="Average Housing Units in San Fransisco from 2010 to 2016",
+    frame_width=700,
+    frame_height=300,
+)
+
+PRICES_BY_YEAR_LINE_KWARGS = dict(
+    xlabel="Year",
+    ylabel="Average Sale Price Per Sqr Foot / Gross Rent",
+    title="Average Sale Price Per Sqr Foot / Gross Rent in San Fransisco from 2010 to 2016",
+    frame_width=700,
+    frame_height=300,
+)
+
+NEIGHBORHOOD_LINE_KWARGS = dict(
+    xlabel="Year",
+    ylabel="Average Sale Price Per Sqr Foot / Gross Rent",
+    title="Average Sale Price Per Sqr Foot / Gross Rent in San Fransisco from 2010 to 2016 (Per Neighborhood)",
+    frame_width=700,
+    frame_height=300,
+)
+
+NEIGHBORHOOD_MAP_KWARGS = dict(
+    geo=True,
+    color="gross_rent",
+    title="SF Neighborhood Gross Rents (by Sales Price Per Sqr Foot)",
+    size="sale_price_sqr_foot",
+    tiles="OSM",
+    frame_width=700,
+    frame_height=500,
+    hover_cols="Neighborhood",
+)
+
+# Shared y-axis formatting applied with .opts()
+Y_FORMAT_OPTS = dict(yformatter='%.0f')
+
+# Options behind each chart builder below; part of the plot cache key, so editing them invalidates cached charts
+CHART_OPTIONS = {
+    "housing_units_bar": (HOUSING_UNITS_BAR_KWARGS, Y_FORMAT_OPTS),
+    "prices_by_year_line": (PRICES_BY_YEAR_LINE_KWARGS, Y_FORMAT_OPTS),
+    "neighborhood_line": (NEIGHBORHOOD_LINE_KWARGS, Y_FORMAT_OPTS),
+    "neighborhood_series_line": (NEIGHBORHOOD_LINE_KWARGS, Y_FORMAT_OPTS),
+    "neighborhood_map": (NEIGHBORHOOD_MAP_KWARGS,),
+}
+
+
+def _hvplot():
+    # Registers the .hvplot accessor on pandas objects on first use
+    import hvplot.pandas  # noqa: F401
+
+
+def housing_units_ylim(housing_units_by_year):
+    """Bar chart y range: 25% of the (max - min) spread below the min and above the max."""
+    housing_units = housing_units_by_year["housing_units"]
+    low, high = housing_units.min(), housing_units.max()
+    bar_range_housing_unit = (high - low) * 0.25
+    return [low - bar_range_housing_unit, high + bar_range_housing_unit]
+
+
+def housing_units_bar(housing_units_by_year):
+    """Bar chart of the average housing units per year."""
+    _hvplot()
+    return housing_units_by_year.hvplot.bar(
+        ylim=housing_units_ylim(housing_units_by_year),
+        **HOUSING_UNITS_BAR_KWARGS,
+    ).opts(**Y_FORMAT_OPTS)
+
+
+def prices_by_year_line(prices_square_foot_by_year):
+    """Line chart of the average sale price per square foot and gross rent per year."""
+    _hvplot()
+    return prices_square_foot_by_year.hvplot.line(**PRICES_BY_YEAR_LINE_KWARGS).opts(**Y_FORMAT_OPTS)
+
+
+def neighborhood_line(prices_by_year_by_neighborhood):
+    """Per-neighborhood line chart with a neighborhood dropdown."""
+    store = NeighborhoodSeriesStore.from_frame(prices_by_year_by_neighborhood)
+    return neighborhood_line_plot(store, opts=Y_FORMAT_OPTS, **NEIGHBORHOOD_LINE_KWARGS)
+
+
+def neighborhood_series_line(neighborhood, neighborhood_series_df):
+    """Static line chart for one neighborhood's year series (used for the per-neighborhood report pages)."""
+    _hvplot()
+    kwargs = dict(NEIGHBORHOOD_LINE_KWARGS, title=f"{NEIGHBORHOOD_LINE_KWARGS['title']}: {neighborhood}")
+    return neighborhood_series_df.hvplot.line(**kwargs).opts(**Y_FORMAT_OPTS)
+
+
+def neighborhood_map(all_neighborhoods_df):
+    """OSM points map of the neighborhoods, sized by price per square foot and colored by gross rent."""
+    _hvplot()
+    return all_neighborhoods_df.hvplot.points('Lon', 'Lat', **NEIGHBORHOOD_MAP_KWARGS)
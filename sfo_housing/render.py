@@ -0,0 +1,193 @@
+"""Batch export of the report charts across a process pool.
+
+Usage::
+
+    python -m sfo_housing.render --output report --workers 8 --format html
+
+Renders one line chart per neighborhood, the housing units bar chart, the
+price/rent by year line chart and the neighborhood map.  Each job carries only
+the slice of the aggregated data its chart needs, so workers never load the
+census data themselves; with ``--snapshot`` a job only names its slice, and
+each worker maps the snapshot once and reads the slice from it.  Progress and per-chart timings are printed as charts
+complete.  Charts whose data and options are unchanged since the last run are
+copied from the :class:`~sfo_housing.plot_cache.PlotCache` instead of being
+rebuilt.
+"""
+
+import argparse
+import os
+import re
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from sfo_housing.plot_cache import DEFAULT_MAX_BYTES, DEFAULT_PLOT_CACHE_DIR, PlotCache, chart_key
+
+# One chart to render
+#   - name: chart name, also used for the output file name
+#   - chart: name of the chart builder function in sfo_housing.plots
+#   - args: the (already sliced) data passed to the chart builder
+RenderJob = namedtuple("RenderJob", ["name", "chart", "args"])
+
+# Stands in for RenderJob.args when the worker reads its data from a snapshot
+#   - path: snapshot file, mapped once per worker process
+#   - neighborhood: the neighborhood of a per-neighborhood chart, None for the other charts
+SnapshotSlice = namedtuple("SnapshotSlice", ["path", "neighborhood"])
+
+# Outcome of a job: output path, seconds spent producing it and whether it came from the plot cache
+RenderResult = namedtuple("RenderResult", ["name", "path", "seconds", "cached"])
+
+DEFAULT_OUTPUT_DIR = Path('./report')
+
+
+def _slug(name):
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower()
+
+
+def _unique_slugs(names):
+    """File-name slugs for ``names``, made unique.
+
+    Names that slug alike (``"Bernal Heights"`` and ``"Bernal Heights "``) get
+    ``_2``, ``_3``... suffixes in order instead of overwriting each other's file.
+    """
+    slugs = []
+    seen = set()
+    for name in names:
+        slug = base = _slug(name)
+        suffix = 1
+        while slug in seen:
+            suffix += 1
+            slug = f"{base}_{suffix}"
+        seen.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def _chart_args(results, chart, neighborhood=None):
+    # The slice of the results one chart needs
+    if chart == "neighborhood_series_line":
+        prices = results.prices_by_year_by_neighborhood
+        return neighborhood, prices.xs(neighborhood, level="neighborhood")
+    table = {
+        "housing_units_bar": results.housing_units_by_year,
+        "prices_by_year_line": results.prices_square_foot_by_year,
+        "neighborhood_map": results.all_neighborhoods_df,
+    }[chart]
+    return (table,)
+
+
+def build_jobs(results, snapshot_path=None):
+    """Split :data:`~sfo_housing.analysis.AnalysisResults` into one render job per chart.
+
+    With ``snapshot_path`` (the snapshot ``results`` were read from), jobs
+    carry a :data:`SnapshotSlice` instead of the data, and each worker maps the
+    snapshot once and slices its own data out of it.
+    """
+    charts = [
+        ("housing_units_by_year", "housing_units_bar", None),
+        ("prices_square_foot_by_year", "prices_by_year_line", None),
+        ("neighborhood_map", "neighborhood_map", None),
+    ]
+    neighborhoods = results.prices_by_year_by_neighborhood.index.unique(level="neighborhood").sort_values()
+    for slug, neighborhood in zip(_unique_slugs(neighborhoods), neighborhoods):
+        charts.append((f"neighborhood_{slug}", "neighborhood_series_line", neighborhood))
+
+    if snapshot_path is not None:
+        return [
+            RenderJob(name, chart, SnapshotSlice(str(snapshot_path), neighborhood))
+            for name, chart, neighborhood in charts
+        ]
+    return [RenderJob(name, chart, _chart_args(results, chart, neighborhood)) for name, chart, neighborhood in charts]
+
+
+def render_job(job, output_dir, fmt="html", cache=None):
+    """Build and save one chart (runs inside a worker process)."""
+    from sfo_housing import plots
+
+    start = time.perf_counter()
+    path = Path(output_dir) / f"{job.name}.{fmt}"
+
+    args = job.args
+    if isinstance(args, SnapshotSlice):
+        from sfo_housing.snapshot import worker_results
+
+        args = _chart_args(worker_results(args.path), job.chart, args.neighborhood)
+
+    builder = getattr(plots, job.chart)
+    if cache is not None:
+        key = chart_key(job.chart, args, plots.CHART_OPTIONS.get(job.chart, ()), builder)
+        if cache.get(key, fmt, path):
+            return RenderResult(job.name, path, time.perf_counter() - start, True)
+
+    # Imported in the worker, and only on a cache miss, so cached runs never load the plotting stack
+    import hvplot
+
+    chart = builder(*args)
+    hvplot.save(chart, path)
+    if cache is not None:
+        cache.put(key, fmt, path)
+    return RenderResult(job.name, path, time.perf_counter() - start, False)
+
+
+def render_all(jobs, output_dir=DEFAULT_OUTPUT_DIR, fmt="html", workers=None, cache=None, progress=print):
+    """Render ``jobs`` across ``workers`` processes; return the results in completion order."""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    rendered = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(render_job, job, output_dir, fmt, cache): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            rendered.append(result)
+            if progress is not None:
+                source = "cached" if result.cached else "rendered"
+                progress(f"[{done}/{len(jobs)}] {result.name}: {source} in {result.seconds:0.2f} s -> {result.path}")
+    return rendered
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render every report chart in parallel.")
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT_DIR, help="output folder")
+    parser.add_argument("--format", choices=["html", "png"], default="html", help="output file format")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--plot-cache-dir", type=Path, default=DEFAULT_PLOT_CACHE_DIR, help="rendered chart cache folder")
+    parser.add_argument("--plot-cache-mb", type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024), help="plot cache size limit (MB)")
+    parser.add_argument("--no-plot-cache", action="store_true", help="always re-render every chart")
+    parser.add_argument(
+        "--snapshot", type=Path, nargs="?", const=True, default=None,
+        help="read the aggregates from a memory-mapped snapshot (built if missing or stale) instead of the CSVs",
+    )
+    args = parser.parse_args(argv)
+
+    cache = None
+    if not args.no_plot_cache:
+        cache = PlotCache(args.plot_cache_dir, args.plot_cache_mb * 1024 * 1024)
+
+    start = time.perf_counter()
+    if args.snapshot is not None:
+        from sfo_housing.snapshot import DEFAULT_SNAPSHOT_PATH, build_snapshot, open_snapshot, results_from_snapshot
+
+        snapshot_path = build_snapshot(DEFAULT_SNAPSHOT_PATH if args.snapshot is True else args.snapshot)
+        results = results_from_snapshot(open_snapshot(snapshot_path))
+    else:
+        from sfo_housing.analysis import run_analysis
+
+        snapshot_path = None
+        results = run_analysis()
+    jobs = build_jobs(results, snapshot_path)
+    rendered = render_all(jobs, args.output, args.format, args.workers, cache)
+    elapsed = time.perf_counter() - start
+
+    chart_seconds = sum(result.seconds for result in rendered)
+    cached = sum(result.cached for result in rendered)
+    print(
+        f"Rendered {len(rendered)} charts ({cached} from cache) in {elapsed:0.2f} s "
+        f"({chart_seconds:0.2f} s of chart time)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Vectorized buy-and-rent screener over every neighborhood at once.
+
+The data story's "Park North" pick came from browsing the neighborhood widget
+one neighborhood at a time.  ``screen_neighborhoods`` pivots
+``prices_by_year_by_neighborhood`` into (neighborhood x year) matrices and
+computes every neighborhood's growth, yield and drawdown figures with array
+operations; ``top_k`` ranks them with a partial sort.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Screener output columns that can be ranked on
+SCREEN_COLUMNS = [
+    "price_cagr",
+    "rent_cagr",
+    "rent_to_price",
+    "drawdown_from_peak",
+]
+
+
+def _first_last(values, years):
+    """Per row: the first and last non-NaN value in ``values`` and the years they fall in."""
+    valid = ~np.isnan(values)
+    has_data = valid.any(axis=1)
+    first = valid.argmax(axis=1)
+    last = values.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+    rows = np.arange(len(values))
+
+    first_value = np.where(has_data, values[rows, first], np.nan)
+    last_value = np.where(has_data, values[rows, last], np.nan)
+    first_year = np.where(has_data, years[first], np.nan)
+    last_year = np.where(has_data, years[last], np.nan)
+    return first_value, last_value, first_year, last_year
+
+
+def _cagr(first_value, last_value, first_year, last_year):
+    periods = last_year - first_year
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = last_value / first_value
+        cagr = np.power(growth, 1.0 / periods) - 1.0
+    # Needs at least two distinct years and a positive starting value
+    return np.where((periods > 0) & (first_value > 0), cagr, np.nan)
+
+
+def screen_neighborhoods(prices_by_year_by_neighborhood, start_year=None, end_year=None):
+    """Buy-and-rent figures for every neighborhood over ``[start_year, end_year]``.
+
+    Returns one row per neighborhood with:
+
+    - ``price_cagr`` / ``rent_cagr``: compound annual growth of
+      ``sale_price_sqr_foot`` / ``gross_rent`` between the first and last year
+      with data in the window
+    - ``rent_to_price``: latest ``gross_rent`` divided by the latest
+      ``sale_price_sqr_foot`` in the window (a yield proxy; higher is better)
+    - ``drawdown_from_peak``: latest price relative to the window's peak price
+      (0 at the peak, -0.25 means 25% below it)
+    - ``first_year`` / ``last_year``: the years the growth rates span
+    """
+    prices = prices_by_year_by_neighborhood[["sale_price_sqr_foot", "gross_rent"]]
+    years = prices.index.get_level_values("year")
+    in_window = np.ones(len(prices), dtype=bool)
+    if start_year is not None:
+        in_window &= years >= start_year
+    if end_year is not None:
+        in_window &= years <= end_year
+
+    # One unstack gives dense (neighborhood x year) matrices for both metrics
+    wide = prices[in_window].unstack("year").sort_index(axis="columns")
+    price = wide["sale_price_sqr_foot"].to_numpy(dtype=np.float64)
+    rent = wide["gross_rent"].to_numpy(dtype=np.float64)
+    window_years = wide["sale_price_sqr_foot"].columns.to_numpy(dtype=np.float64)
+
+    first_price, last_price, first_year, last_year = _first_last(price, window_years)
+    first_rent, last_rent, first_rent_year, last_rent_year = _first_last(rent, window_years)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        peak_price = np.fmax.reduce(price, axis=1) if price.size else np.full(len(price), np.nan)
+        drawdown = last_price / peak_price - 1.0
+        rent_to_price = last_rent / last_price
+
+    return pd.DataFrame(
+        {
+            "price_cagr": _cagr(first_price, last_price, first_year, last_year),
+            "rent_cagr": _cagr(first_rent, last_rent, first_rent_year, last_rent_year),
+            "rent_to_price": rent_to_price,
+            "drawdown_from_peak": drawdown,
+            "first_year": first_year,
+            "last_year": last_year,
+        },
+        index=wide.index,
+    )
+
+
+def top_k(screen_df, k=10, by="rent_cagr", largest=True):
+    """The ``k`` best neighborhoods by ``by``, best first.
+
+    Uses ``np.argpartition`` to pick the k candidates in linear time and only
+    sorts those k rows.  Neighborhoods with no value for ``by`` rank last.
+    """
+    values = screen_df[by].to_numpy(dtype=np.float64)
+    # Turn "largest first" into "smallest first" and push NaNs to the end
+    keys = np.where(np.isnan(values), np.inf, -values if largest else values)
+
+    k = min(k, len(keys))
+    if k <= 0:
+        return screen_df.iloc[:0]
+    candidates = np.argpartition(keys, k - 1)[:k] if k < len(keys) else np.arange(len(keys))
+    ranked = candidates[np.argsort(keys[candidates], kind="stable")]
+    return screen_df.iloc[ranked]
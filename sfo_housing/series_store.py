@@ -0,0 +1,99 @@
+"""Per-neighborhood year series laid out contiguously (CSR style).
+
+``prices_by_year_by_neighborhood.hvplot.line(groupby="neighborhood")`` filters
+the whole MultiIndex frame each time the dropdown changes and embeds every
+group on export.  ``NeighborhoodSeriesStore`` keeps one flat array per metric
+with each neighborhood's years stored back to back, plus an ``offsets`` array:
+neighborhood ``i`` owns rows ``offsets[i]:offsets[i + 1]``.  Fetching a series
+is a dict lookup and a slice, which returns a view (no copy).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class NeighborhoodSeriesStore:
+    """Contiguous per-neighborhood ``year`` series for a set of metrics."""
+
+    def __init__(self, neighborhoods, offsets, years, columns):
+        self.neighborhoods = pd.Index(neighborhoods, name="neighborhood")
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.years = np.asarray(years)
+        self.columns = {metric: np.ascontiguousarray(values) for metric, values in columns.items()}
+        self.metrics = list(self.columns)
+        self._positions = {name: position for position, name in enumerate(self.neighborhoods)}
+
+    @classmethod
+    def from_frame(cls, neighborhood_year_df, metrics=None):
+        """Build the store from a frame indexed by (neighborhood, year).
+
+        ``prices_by_year_by_neighborhood`` is already in this shape.
+        """
+        neighborhood_year_df = neighborhood_year_df.sort_index(level=["neighborhood", "year"])
+        neighborhood_labels = neighborhood_year_df.index.get_level_values("neighborhood")
+        codes, neighborhoods = pd.factorize(neighborhood_labels, sort=True)
+
+        # Rows are sorted by neighborhood, so the offsets are just the cumulative group sizes
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(neighborhoods)))])
+        metrics = list(neighborhood_year_df.columns) if metrics is None else list(metrics)
+        columns = {
+            metric: neighborhood_year_df[metric].to_numpy(dtype=np.float64)
+            for metric in metrics
+        }
+        years = neighborhood_year_df.index.get_level_values("year").to_numpy()
+        return cls(neighborhoods, offsets, years, columns)
+
+    @classmethod
+    def from_cube(cls, cube, metrics=None):
+        """Build the store straight from an :class:`~sfo_housing.cube.AggregationCube`."""
+        return cls.from_frame(cube.neighborhood_year_mean(metrics))
+
+    def __len__(self):
+        return len(self.neighborhoods)
+
+    def __contains__(self, neighborhood):
+        return neighborhood in self._positions
+
+    def _bounds(self, neighborhood):
+        position = self._positions[neighborhood]
+        return self.offsets[position], self.offsets[position + 1]
+
+    def years_for(self, neighborhood):
+        """Years present for ``neighborhood`` (a view into the store)."""
+        start, stop = self._bounds(neighborhood)
+        return self.years[start:stop]
+
+    def series(self, neighborhood, metric):
+        """One metric's values for ``neighborhood`` as a zero-copy view."""
+        start, stop = self._bounds(neighborhood)
+        return self.columns[metric][start:stop]
+
+    def frame(self, neighborhood, metrics=None):
+        """The neighborhood's series as a small year-indexed DataFrame (for plotting)."""
+        start, stop = self._bounds(neighborhood)
+        metrics = self.metrics if metrics is None else metrics
+        return pd.DataFrame(
+            {metric: self.columns[metric][start:stop] for metric in metrics},
+            index=pd.Index(self.years[start:stop], name="year"),
+        )
+
+
+def neighborhood_line_plot(store, metrics=None, **plot_kwargs):
+    """Interactive per-neighborhood line chart backed by ``store``.
+
+    Builds a HoloViews ``DynamicMap`` with a ``neighborhood`` dropdown; each
+    selection slices only that neighborhood's series out of the store instead
+    of filtering the full frame, and exported HTML does not embed every group.
+    Plotting libraries are imported here, on first use.
+    """
+    import holoviews as hv
+    import hvplot.pandas  # noqa: F401 - registers the .hvplot accessor
+
+    opts = plot_kwargs.pop("opts", {})
+
+    def plot_neighborhood(neighborhood):
+        return store.frame(neighborhood, metrics).hvplot.line(**plot_kwargs).opts(**opts)
+
+    return hv.DynamicMap(plot_neighborhood, kdims="neighborhood").redim.values(
+        neighborhood=list(store.neighborhoods)
+    )
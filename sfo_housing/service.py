@@ -0,0 +1,259 @@
+"""Local asyncio HTTP service answering the notebook's questions from memory.
+
+Usage::
+
+    python -m sfo_housing.service --port 8050
+
+The census data in ``Resources/`` is loaded and aggregated once at start-up;
+every request is then answered from precomputed indexes (no network access,
+no re-running the notebook).  Endpoints (all ``GET``, JSON responses):
+
+- ``/highest/gross_rent`` and ``/highest/sale_price_sqr_foot``: the top
+  neighborhood, or the top ``k`` with ``?k=5``
+- ``/neighborhood/<name>``: that neighborhood's ``sale_price_sqr_foot`` and
+  ``gross_rent`` series by year (name matching ignores case and spacing)
+- ``/range?sale_price_sqr_foot=300:600&gross_rent=4000:``: neighborhoods
+  whose values fall in every ``low:high`` range (either side may be left open)
+- ``/yoy-drops``: years whose average price per square foot fell, with the
+  gross rent change in the same year
+- ``/answers``: every answer the notebook computes
+- ``/metrics``: request counts and p50/p99 latency per endpoint
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict, deque
+from urllib.parse import parse_qs, unquote, urlsplit
+
+import numpy as np
+
+from sfo_housing.analysis import run_analysis
+from sfo_housing.metric_index import MetricIndex
+from sfo_housing.neighborhoods import NeighborhoodDictionary
+from sfo_housing.series_store import NeighborhoodSeriesStore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8050
+
+# Latency samples kept per endpoint for the percentile metrics
+LATENCY_WINDOW = 10_000
+
+# Metrics that can be ranked through /highest/<metric>
+RANKED_METRICS = ["gross_rent", "sale_price_sqr_foot"]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}
+
+
+class QueryIndex:
+    """Everything the service answers, precomputed from one analysis run."""
+
+    def __init__(self, results):
+        self.answers = results.answers
+        self.store = NeighborhoodSeriesStore.from_frame(results.prices_by_year_by_neighborhood)
+        # Names are matched through the dictionary's normalized keys; the store is keyed by the
+        # cube's tidied labels, which the same normalization maps back to
+        self.dictionary = NeighborhoodDictionary()
+        ids = self.dictionary.encode(self.store.neighborhoods)
+        self._store_names = dict(zip(ids.tolist(), self.store.neighborhoods))
+
+        # Sorted per-metric index: top-k is a slice, ranges are binary searches
+        neighborhoods_df = results.all_neighborhoods_df.set_index("Neighborhood")
+        self.metric_index = MetricIndex(neighborhoods_df, RANKED_METRICS)
+
+        # Responses that never change are encoded once
+        self._encoded = {
+            "answers": _encode(self.answers),
+            "yoy-drops": _encode({"price_drops": self.answers["price_drops"]}),
+        }
+        for metric in RANKED_METRICS:
+            self._encoded[f"highest/{metric}"] = _encode(self._ranked(metric, 1)[0])
+
+    def encoded(self, name):
+        """A precomputed response body (``"answers"`` or ``"yoy-drops"``)."""
+        return self._encoded[name]
+
+    def _ranked(self, metric, k):
+        top_df = self.metric_index.top_k(metric, k)
+        return [{"neighborhood": name, metric: float(value)} for name, value in top_df[metric].items()]
+
+    def highest(self, metric, k=None):
+        if k is None:
+            return self._encoded[f"highest/{metric}"]
+        return _encode(self._ranked(metric, k))
+
+    def in_range(self, bounds):
+        """Neighborhoods within every ``{metric: (low, high)}`` bound."""
+        matches_df = self.metric_index.range_query(bounds)
+        return _encode([
+            {"neighborhood": name, **{metric: float(value) for metric, value in row.items()}}
+            for name, row in matches_df.iterrows()
+        ])
+
+    def neighborhood(self, name):
+        neighborhood_id = int(self.dictionary.encode([name], add=False)[0])
+        if neighborhood_id < 0:
+            return None
+        store_name = self._store_names[neighborhood_id]
+        series = {
+            metric: [float(value) for value in self.store.series(store_name, metric)]
+            for metric in self.store.metrics
+        }
+        series["year"] = [int(year) for year in self.store.years_for(store_name)]
+        return _encode({"neighborhood": self.dictionary.labels[neighborhood_id], **series})
+
+
+class LatencyMetrics:
+    """Per-endpoint request counts and a sliding window of latencies."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self.counts = defaultdict(int)
+        self.samples = defaultdict(lambda: deque(maxlen=window))
+
+    def record(self, endpoint, seconds):
+        self.counts[endpoint] += 1
+        self.samples[endpoint].append(seconds)
+
+    def snapshot(self):
+        report = {}
+        for endpoint, samples in self.samples.items():
+            latencies_ms = np.asarray(samples) * 1000
+            report[endpoint] = {
+                "requests": self.counts[endpoint],
+                "p50_ms": float(np.percentile(latencies_ms, 50)),
+                "p99_ms": float(np.percentile(latencies_ms, 99)),
+                "max_ms": float(latencies_ms.max()),
+            }
+        return report
+
+
+def _encode(payload):
+    return json.dumps(payload).encode()
+
+
+class QueryService:
+    """HTTP/1.1 front end over a :class:`QueryIndex` (keep-alive, GET only)."""
+
+    def __init__(self, index):
+        self.index = index
+        self.metrics = LatencyMetrics()
+
+    def route(self, target):
+        """Return ``(endpoint, status, body)`` for a request target."""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/") if part]
+        query = parse_qs(url.query)
+
+        if parts == ["answers"] or parts == ["yoy-drops"]:
+            return parts[0], 200, self.index.encoded(parts[0])
+
+        if len(parts) == 2 and parts[0] == "highest":
+            if parts[1] not in RANKED_METRICS:
+                return "highest", 404, _encode({"error": f"unknown metric {parts[1]!r}"})
+            k = None
+            if "k" in query:
+                try:
+                    k = int(query["k"][0])
+                    if k < 1:
+                        raise ValueError(k)
+                except ValueError:
+                    return "highest", 400, _encode({"error": "k must be a positive integer"})
+            return f"highest/{parts[1]}", 200, self.index.highest(parts[1], k)
+
+        if parts == ["range"]:
+            bounds = {}
+            for metric, (value,) in ((metric, values[:1]) for metric, values in query.items()):
+                if metric not in RANKED_METRICS:
+                    return "range", 400, _encode({"error": f"unknown query parameter {metric!r}"})
+                low, _, high = value.partition(":")
+                try:
+                    bounds[metric] = (float(low) if low else None, float(high) if high else None)
+                except ValueError:
+                    return "range", 400, _encode({"error": f"bad range {value!r}, expected low:high"})
+            return "range", 200, self.index.in_range(bounds)
+
+        if len(parts) == 2 and parts[0] == "neighborhood":
+            body = self.index.neighborhood(parts[1])
+            if body is None:
+                return "neighborhood", 404, _encode({"error": f"unknown neighborhood {parts[1]!r}"})
+            return "neighborhood", 200, body
+
+        if parts == ["metrics"]:
+            return "metrics", 200, _encode(self.metrics.snapshot())
+
+        if parts == ["health"]:
+            return "health", 200, b'{"status": "ok"}'
+
+        return "not_found", 404, _encode({"error": f"no route for {url.path!r}"})
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                start = time.perf_counter()
+
+                # Read (and ignore) the headers, noting whether the client wants to close
+                keep_alive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = header.decode("latin-1").partition(":")
+                    if name.strip().lower() == "connection" and value.strip().lower() == "close":
+                        keep_alive = False
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    endpoint, status, body = "bad_request", 400, _encode({"error": "malformed request line"})
+                    keep_alive = False
+                else:
+                    if version == "HTTP/1.0":
+                        keep_alive = False
+                    if method != "GET":
+                        endpoint, status, body = "bad_method", 405, _encode({"error": "only GET is supported"})
+                    else:
+                        endpoint, status, body = self.route(target)
+
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                self.metrics.record(endpoint, time.perf_counter() - start)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the housing analysis answers over local HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    service = QueryService(QueryIndex(run_analysis()))
+    print(f"Loaded the analysis in {time.perf_counter() - start:0.2f} s; serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Parallel Monte Carlo simulation of buy-and-rent returns per neighborhood.
+
+The data story recommends a neighborhood from two endpoint values.  Here each
+neighborhood's yearly ``sale_price_sqr_foot`` and ``gross_rent`` series in
+``prices_by_year_by_neighborhood`` is fitted as a correlated geometric random
+walk (mean and volatility of the yearly log changes), and tens of thousands
+of return paths are drawn per neighborhood with vectorized NumPy.
+
+Usage::
+
+    python -m sfo_housing.simulator --paths 20000 --horizon 5 --workers 8
+
+Neighborhoods are spread over a process pool.  Every neighborhood gets its own
+child of one ``np.random.SeedSequence``, so results depend only on ``seed``,
+never on the number of workers or how the neighborhoods are chunked.
+"""
+
+import argparse
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Paths drawn per neighborhood
+DEFAULT_PATHS = 20_000
+
+# Years held before selling
+DEFAULT_HORIZON_YEARS = 5
+
+# gross_rent is per unit per month and sale_price_sqr_foot per square foot:
+# the purchase price is taken as the price of a unit of this size
+DEFAULT_UNIT_SQR_FEET = 1000
+
+# Percentiles reported for each neighborhood's return distribution
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Neighborhoods simulated per pool task
+_CHUNK_SIZE = 8
+
+# Output of simulate_neighborhoods
+#   - params_df: fitted growth/volatility per neighborhood (see fit_growth)
+#   - returns: (neighborhood, path) array of total returns, rows in params_df order
+#   - summary_df: mean, probability of a loss and percentiles of each row of returns
+SimulationResult = namedtuple("SimulationResult", ["params_df", "returns", "summary_df"])
+
+
+def fit_growth(prices_by_year_by_neighborhood):
+    """Per neighborhood: last price/rent and the mean and volatility of their yearly log changes.
+
+    Log changes are taken between consecutive years with data.  Neighborhoods
+    with fewer than two changes get the median volatility of the others.  The
+    price/rent correlation is pooled over all neighborhoods, as a handful of
+    years per neighborhood cannot pin it down.
+    """
+    prices = prices_by_year_by_neighborhood[["sale_price_sqr_foot", "gross_rent"]]
+    wide = prices.unstack("year").sort_index(axis="columns")
+    price = wide["sale_price_sqr_foot"].to_numpy(dtype=np.float64)
+    rent = wide["gross_rent"].to_numpy(dtype=np.float64)
+
+    def log_changes(values):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.diff(np.log(np.where(values > 0, values, np.nan)), axis=1)
+
+    def last_valid(values):
+        valid = ~np.isnan(values)
+        last = values.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        return np.where(valid.any(axis=1), values[np.arange(len(values)), last], np.nan)
+
+    price_changes, rent_changes = log_changes(price), log_changes(rent)
+    params = {"price": last_valid(price), "rent": last_valid(rent)}
+    for name, changes in (("price", price_changes), ("rent", rent_changes)):
+        observed = (~np.isnan(changes)).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            drift = np.nansum(changes, axis=1) / observed
+            deviations = np.where(np.isnan(changes), 0.0, changes - drift[:, None])
+            volatility = np.sqrt((deviations ** 2).sum(axis=1) / (observed - 1))
+        fallback = np.nanmedian(volatility[observed >= 2]) if (observed >= 2).any() else 0.0
+        params[f"{name}_drift"] = np.where(observed >= 1, drift, 0.0)
+        params[f"{name}_volatility"] = np.where(observed >= 2, volatility, fallback)
+
+    # Pooled correlation of the demeaned changes where both metrics changed
+    both = ~(np.isnan(price_changes) | np.isnan(rent_changes))
+    price_dev = (price_changes - params["price_drift"][:, None])[both]
+    rent_dev = (rent_changes - params["rent_drift"][:, None])[both]
+    denominator = np.sqrt((price_dev ** 2).sum() * (rent_dev ** 2).sum())
+    correlation = float((price_dev * rent_dev).sum() / denominator) if denominator > 0 else 0.0
+    params["correlation"] = np.full(len(price), np.clip(correlation, -1.0, 1.0))
+
+    params_df = pd.DataFrame(params, index=wide.index)
+    # Neighborhoods without a price or rent to start from cannot be simulated
+    return params_df.dropna(subset=["price", "rent"])
+
+
+def simulate_paths(params, rng, paths, horizon_years, unit_sqr_feet):
+    """Total returns of ``paths`` buy-and-rent paths for one neighborhood's fitted ``params``.
+
+    The unit is bought at ``price * unit_sqr_feet``, rented for
+    ``horizon_years`` (12 months of each year's simulated rent) and sold at the
+    simulated price of the final year.  Returns ``(proceeds + rent) / cost - 1``.
+    """
+    shocks = rng.standard_normal((2, paths, horizon_years))
+    correlation = params["correlation"]
+    rent_shocks = correlation * shocks[0] + np.sqrt(1.0 - correlation ** 2) * shocks[1]
+
+    price_growth = np.cumsum(params["price_drift"] + params["price_volatility"] * shocks[0], axis=1)
+    rent_growth = np.cumsum(params["rent_drift"] + params["rent_volatility"] * rent_shocks, axis=1)
+
+    cost = params["price"] * unit_sqr_feet
+    # Rent for year t is collected at that year's level, the sale happens at the end of the horizon
+    rent_income = 12.0 * params["rent"] * np.exp(rent_growth).sum(axis=1)
+    proceeds = cost * np.exp(price_growth[:, -1])
+    return (proceeds + rent_income) / cost - 1.0
+
+
+def _simulate_chunk(chunk_params, seeds, paths, horizon_years, unit_sqr_feet):
+    """Run every neighborhood of one pool task; one generator per neighborhood seed."""
+    returns = np.empty((len(chunk_params), paths))
+    for row, (params, seed) in enumerate(zip(chunk_params, seeds)):
+        returns[row] = simulate_paths(params, np.random.default_rng(seed), paths, horizon_years, unit_sqr_feet)
+    return returns
+
+
+def summarize_returns(returns, index, percentiles=DEFAULT_PERCENTILES):
+    """Mean, probability of a loss and percentiles of each row of ``returns``."""
+    summary_df = pd.DataFrame(
+        {"mean_return": returns.mean(axis=1), "probability_of_loss": (returns < 0).mean(axis=1)},
+        index=index,
+    )
+    for percentile, values in zip(percentiles, np.percentile(returns, percentiles, axis=1)):
+        summary_df[f"p{percentile}"] = values
+    return summary_df
+
+
+def simulate_neighborhoods(
+    prices_by_year_by_neighborhood,
+    paths=DEFAULT_PATHS,
+    horizon_years=DEFAULT_HORIZON_YEARS,
+    seed=0,
+    workers=None,
+    unit_sqr_feet=DEFAULT_UNIT_SQR_FEET,
+    percentiles=DEFAULT_PERCENTILES,
+):
+    """Fit every neighborhood and simulate its buy-and-rent returns; return a :data:`SimulationResult`.
+
+    ``workers=1`` runs in this process; otherwise neighborhoods are simulated
+    in chunks across a process pool (default: CPU count).
+    """
+    params_df = fit_growth(prices_by_year_by_neighborhood)
+    records = params_df.to_dict("records")
+    seeds = np.random.SeedSequence(seed).spawn(len(records))
+    workers = workers or os.cpu_count() or 1
+
+    chunks = [slice(start, start + _CHUNK_SIZE) for start in range(0, len(records), _CHUNK_SIZE)]
+    if workers == 1 or len(chunks) <= 1:
+        parts = [
+            _simulate_chunk(records[chunk], seeds[chunk], paths, horizon_years, unit_sqr_feet) for chunk in chunks
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_simulate_chunk, records[chunk], seeds[chunk], paths, horizon_years, unit_sqr_feet)
+                for chunk in chunks
+            ]
+            parts = [future.result() for future in futures]
+
+    returns = np.concatenate(parts) if parts else np.empty((0, paths))
+    return SimulationResult(params_df, returns, summarize_returns(returns, params_df.index, percentiles))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo buy-and-rent returns for every neighborhood.")
+    parser.add_argument("--paths", type=int, default=DEFAULT_PATHS, help="paths per neighborhood")
+    parser.add_argument("--horizon", type=int, default=DEFAULT_HORIZON_YEARS, help="years held")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--unit-sqr-feet", type=float, default=DEFAULT_UNIT_SQR_FEET, help="size of the unit bought")
+    parser.add_argument("--top", type=int, default=10, help="neighborhoods to print, by median return")
+    args = parser.parse_args(argv)
+
+    from sfo_housing.analysis import run_analysis
+
+    results = run_analysis()
+    start = time.perf_counter()
+    simulation = simulate_neighborhoods(
+        results.prices_by_year_by_neighborhood,
+        paths=args.paths,
+        horizon_years=args.horizon,
+        seed=args.seed,
+        workers=args.workers,
+        unit_sqr_feet=args.unit_sqr_feet,
+    )
+    elapsed = time.perf_counter() - start
+
+    n_neighborhoods, n_paths = simulation.returns.shape
+    print(f"Simulated {n_paths} paths for {n_neighborhoods} neighborhoods in {elapsed:0.2f} s")
+    print(simulation.summary_df.sort_values("p50", ascending=False).head(args.top).to_string(float_format="{:0.3f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+"""Versioned, memory-mapped binary snapshot of the aggregated analysis inputs.
+
+Every report worker that calls ``run_analysis()`` parses the CSVs and builds
+its own cube, so start-up time and memory grow with the number of workers.
+``build_snapshot()`` writes the (neighborhood, year) cube, the neighborhood
+dictionary and the coordinates once to a single file; ``open_snapshot()``
+maps it read-only, so every worker shares the same page-cache pages and the
+cube arrays are zero-copy NumPy views of the file.
+
+File layout (all offsets from the start of the file)::
+
+    magic  b"SFOSNAP\\0"   8 bytes
+    format version         uint32, little endian
+    header length          uint32, little endian
+    header                 JSON: array table (dtype, shape, offset) and metadata
+    arrays                 raw C-order data, each starting on a 64-byte boundary
+
+Strings are stored as fixed-width NumPy unicode arrays, so every column can be
+read with ``np.frombuffer`` (or ``np.memmap``) given its header entry.
+"""
+
+import functools
+import json
+import mmap
+import struct
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sfo_housing.analysis import (
+    AnalysisResults,
+    answer_questions,
+    clean,
+    ingest,
+    join_locations,
+    neighborhood_rollups,
+    year_rollups,
+)
+from sfo_housing.cube import AggregationCube
+from sfo_housing.loader import (
+    CENSUS_DATA_PATH,
+    DEFAULT_CACHE_DIR,
+    NEIGHBORHOOD_COORDINATES_PATH,
+    _file_sha256,
+    load_neighborhood_coordinates,
+)
+from sfo_housing.neighborhoods import NeighborhoodDictionary, unmatched_report
+
+# Default snapshot location, next to the census data snapshots
+DEFAULT_SNAPSHOT_PATH = DEFAULT_CACHE_DIR / "analysis.snap"
+
+# Bump when the file layout or the set of arrays changes; older files are rejected
+SNAPSHOT_FORMAT_VERSION = 1
+
+_MAGIC = b"SFOSNAP\0"
+_PREAMBLE = struct.Struct("<8sII")
+_ALIGNMENT = 64
+
+# Contents of a mapped snapshot
+#   - cube: AggregationCube whose sums/counts/rows are read-only views of the file
+#   - dictionary: NeighborhoodDictionary covering the census and coordinate names
+#   - coordinates_df: neighborhood centroids indexed by Neighborhood (Lat, Lon)
+#   - meta: the header metadata (format version, NaN audit, source fingerprints)
+AnalysisSnapshot = namedtuple("AnalysisSnapshot", ["cube", "dictionary", "coordinates_df", "meta"])
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _string_array(values):
+    # Fixed-width unicode; at least one character so empty inputs still get a valid dtype
+    values = [str(value) for value in values]
+    width = max([len(value) for value in values] + [1])
+    return np.asarray(values, dtype=f"<U{width}")
+
+
+def _fingerprint(path):
+    path = Path(path)
+    stat = path.stat()
+    return {"path": str(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": _file_sha256(path)}
+
+
+def _fingerprint_matches(fingerprint, path):
+    # Same rule as the census loader: trust size + mtime, fall back to the content hash
+    path = Path(path)
+    if not path.exists():
+        return False
+    stat = path.stat()
+    if fingerprint.get("size") != stat.st_size:
+        return False
+    return fingerprint.get("mtime_ns") == stat.st_mtime_ns or fingerprint.get("sha256") == _file_sha256(path)
+
+
+def write_snapshot(path, cube, dictionary, coordinates_df, meta=None):
+    """Write ``cube``, ``dictionary`` and ``coordinates_df`` to a snapshot file at ``path``."""
+    arrays = {
+        "neighborhoods": _string_array(cube.neighborhoods),
+        "years": cube.years.to_numpy(dtype=np.int64),
+        "metrics": _string_array(cube.metrics),
+        "sums": np.ascontiguousarray(cube.sums, dtype=np.float64),
+        "counts": np.ascontiguousarray(cube.counts, dtype=np.int64),
+        "rows": np.ascontiguousarray(cube.rows, dtype=np.int64),
+        "dictionary_keys": _string_array(dictionary.keys),
+        "dictionary_labels": _string_array(dictionary.labels),
+        "coordinate_names": _string_array(coordinates_df.index),
+        "lat": coordinates_df["Lat"].to_numpy(dtype=np.float64),
+        "lon": coordinates_df["Lon"].to_numpy(dtype=np.float64),
+    }
+
+    # The header size depends on the offsets it records: lay out with a placeholder, then fix up
+    table = {name: {"dtype": array.dtype.str, "shape": list(array.shape), "offset": 0} for name, array in arrays.items()}
+    header_meta = dict(meta or {}, format_version=SNAPSHOT_FORMAT_VERSION)
+    while True:
+        header = json.dumps({"arrays": table, "meta": header_meta}).encode()
+        offset = _aligned(_PREAMBLE.size + len(header))
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = offset
+            offset = _aligned(offset + array.nbytes)
+        if all(table[name]["offset"] == layout[name] for name in arrays):
+            break
+        for name in arrays:
+            table[name]["offset"] = layout[name]
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Write to a temporary file and swap it in: workers mapping the old file keep a consistent view
+    partial_path = path.with_name(path.name + ".partial")
+    with open(partial_path, "wb") as snapshot:
+        snapshot.write(_PREAMBLE.pack(_MAGIC, SNAPSHOT_FORMAT_VERSION, len(header)))
+        snapshot.write(header)
+        for name, array in arrays.items():
+            snapshot.seek(table[name]["offset"])
+            snapshot.write(array.tobytes())
+        snapshot.truncate(offset)
+    partial_path.replace(path)
+    return path
+
+
+def read_header(path):
+    """The parsed JSON header of a snapshot (array table and metadata), without mapping the data."""
+    with open(path, "rb") as snapshot:
+        magic, version, header_length = _PREAMBLE.unpack(snapshot.read(_PREAMBLE.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not an analysis snapshot")
+        if version != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(
+                f"{path} has snapshot format version {version}, expected {SNAPSHOT_FORMAT_VERSION}"
+            )
+        return json.loads(snapshot.read(header_length))
+
+
+def open_snapshot(path=DEFAULT_SNAPSHOT_PATH):
+    """Map a snapshot read-only and return an :data:`AnalysisSnapshot`.
+
+    The cube arrays are views of the mapping (no copy, not writable); the
+    mapping stays open for as long as any of them is referenced.
+    """
+    header = read_header(path)
+    with open(path, "rb") as snapshot:
+        mapping = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def column(name):
+        entry = header["arrays"][name]
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        return np.frombuffer(mapping, dtype=dtype, count=count, offset=entry["offset"]).reshape(entry["shape"])
+
+    cube = AggregationCube(
+        column("neighborhoods"),
+        column("years"),
+        column("metrics").tolist(),
+        column("sums"),
+        column("counts"),
+        column("rows"),
+    )
+    dictionary = NeighborhoodDictionary.from_keys(column("dictionary_keys"), column("dictionary_labels"))
+    coordinates_df = pd.DataFrame(
+        {"Lat": column("lat"), "Lon": column("lon")},
+        index=pd.Index(column("coordinate_names").astype(object), name="Neighborhood"),
+    )
+    return AnalysisSnapshot(cube, dictionary, coordinates_df, header["meta"])
+
+
+def snapshot_is_current(path, census_path=CENSUS_DATA_PATH, coordinates_path=NEIGHBORHOOD_COORDINATES_PATH):
+    """Whether the snapshot at ``path`` exists, has the current format and matches both source files."""
+    try:
+        meta = read_header(path)["meta"]
+    except (OSError, ValueError, struct.error):
+        return False
+    sources = meta.get("sources", {})
+    return (
+        _fingerprint_matches(sources.get("census", {}), census_path)
+        and _fingerprint_matches(sources.get("coordinates", {}), coordinates_path)
+    )
+
+
+def build_snapshot(
+    path=DEFAULT_SNAPSHOT_PATH,
+    census_path=CENSUS_DATA_PATH,
+    coordinates_path=NEIGHBORHOOD_COORDINATES_PATH,
+    force=False,
+    **load_kwargs,
+):
+    """Aggregate the CSVs and write the snapshot, unless an up-to-date one already exists.
+
+    Returns the snapshot path.  Call this once in the parent process, then
+    hand the path to the workers.
+    """
+    path = Path(path)
+    if not force and snapshot_is_current(path, census_path, coordinates_path):
+        return path
+
+    sources = {"census": _fingerprint(census_path), "coordinates": _fingerprint(coordinates_path)}
+    nan_entries, sfo_data_df = clean(ingest(census_path, **load_kwargs))
+    cube = AggregationCube.from_frame(sfo_data_df)
+    coordinates_df = load_neighborhood_coordinates(coordinates_path)
+
+    # Census names first so their IDs follow the cube's neighborhood axis
+    dictionary = NeighborhoodDictionary()
+    dictionary.encode(cube.neighborhoods)
+    dictionary.encode(coordinates_df.index)
+
+    meta = {"nan_entries": nan_entries, "rows": int(cube.rows.sum()), "sources": sources}
+    return write_snapshot(path, cube, dictionary, coordinates_df, meta)
+
+
+def results_from_snapshot(snapshot):
+    """The notebook's tables and answers from a mapped snapshot, without reading the CSVs.
+
+    ``sfo_data_df`` and ``stats`` are ``None``: the snapshot only holds the aggregates.
+    """
+    housing_units_by_year, prices_square_foot_by_year = year_rollups(snapshot.cube)
+    prices_by_year_by_neighborhood, all_neighborhood_info_df = neighborhood_rollups(snapshot.cube)
+    location_join = join_locations(snapshot.coordinates_df, all_neighborhood_info_df, snapshot.dictionary)
+    all_neighborhoods_df = location_join.joined_df
+    return AnalysisResults(
+        snapshot.meta.get("nan_entries"),
+        None,
+        snapshot.cube,
+        housing_units_by_year,
+        prices_square_foot_by_year,
+        prices_by_year_by_neighborhood,
+        all_neighborhood_info_df,
+        all_neighborhoods_df,
+        unmatched_report(location_join),
+        answer_questions(prices_square_foot_by_year, all_neighborhoods_df),
+        None,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def worker_snapshot(path=DEFAULT_SNAPSHOT_PATH):
+    """:func:`open_snapshot`, mapped once per process (for pool workers)."""
+    return open_snapshot(path)
+
+
+@functools.lru_cache(maxsize=None)
+def worker_results(path=DEFAULT_SNAPSHOT_PATH):
+    """:func:`results_from_snapshot` of :func:`worker_snapshot`, derived once per process.
+
+    Render workers call this with the snapshot path from their job and slice
+    their chart's data out of the result.
+    """
+    return results_from_snapshot(worker_snapshot(path))
@@ -0,0 +1,310 @@
+"""Batch point-to-neighborhood lookup over the neighborhood centroids.
+
+Property listings only carry a latitude/longitude.  ``NeighborhoodGridIndex``
+assigns each point to its nearest neighborhood centroid (from
+``neighborhoods_coordinates.csv``) using a uniform grid: for every grid cell
+the set of centroids that can possibly be nearest to *some* point inside the
+cell is precomputed, so a lookup only compares a point against that short
+candidate list.  Lookups are vectorized over millions of points at a time.
+
+Besides the nearest centroid, the index answers k-nearest queries
+(``query_knn``, with the per-cell candidate lists widened for each k) and
+radius queries (``query_radius``, every centroid within a distance, returned
+as CSR offsets and ids).
+"""
+
+import numpy as np
+
+from sfo_housing.loader import NEIGHBORHOOD_COORDINATES_PATH, load_neighborhood_coordinates
+
+# Mean Earth radius, used to turn projected degrees into kilometres
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = EARTH_RADIUS_KM * np.pi / 180.0
+
+# Points are looked up in blocks of this many rows to bound temporary memory
+LOOKUP_BLOCK_SIZE = 1_000_000
+
+# Cells are processed in blocks when building candidate lists (cells x centroids distances)
+BUILD_BLOCK_SIZE = 4096
+
+
+class NeighborhoodGridIndex:
+    """Uniform-grid nearest-centroid index.
+
+    Coordinates are projected with an equirectangular projection centred on
+    the centroids (longitude scaled by cos(latitude)), which is accurate to
+    well under a percent across a city.
+    """
+
+    def __init__(self, names, lat, lon, cells_per_centroid=4.0):
+        self.names = np.asarray(names, dtype=object)
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        if len(self.names) == 0:
+            raise ValueError("Cannot build a spatial index without any centroids")
+
+        self._lon_scale = np.cos(np.radians(lat.mean()))
+        self._points = np.column_stack(self._project(lat, lon))
+
+        # Grid bounds: the centroid bounding box, padded so the outer cells are not degenerate
+        low = self._points.min(axis=0)
+        high = self._points.max(axis=0)
+        span = np.maximum(high - low, 1e-6)
+        self._low = low - 0.25 * span
+        self._high = high + 0.25 * span
+
+        # About `cells_per_centroid` cells per centroid, split in proportion to the box's aspect ratio
+        n_cells = max(1, int(np.ceil(len(self.names) * cells_per_centroid)))
+        extent = self._high - self._low
+        nx = max(1, int(round(np.sqrt(n_cells * extent[0] / extent[1]))))
+        ny = max(1, int(np.ceil(n_cells / nx)))
+        self._shape = np.array([nx, ny])
+        self._cell_size = extent / self._shape
+
+        self._build_candidates()
+
+    @classmethod
+    def from_csv(cls, path=NEIGHBORHOOD_COORDINATES_PATH, **kwargs):
+        """Build the index from ``neighborhoods_coordinates.csv``."""
+        coordinates_df = load_neighborhood_coordinates(path)
+        return cls(coordinates_df.index, coordinates_df["Lat"], coordinates_df["Lon"], **kwargs)
+
+    def _project(self, lat, lon):
+        return lon * self._lon_scale, lat
+
+    def _projected(self, lat, lon):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        x, y = self._project(lat, lon)
+        return np.column_stack([x, y])
+
+    def _build_candidates(self):
+        """Precompute, per cell, the centroids that can be nearest to a point in the cell."""
+        self.candidate_offsets, self.candidate_ids, self._candidate_table = self._candidate_lists(1)
+        self._knn_tables = {1: self._candidate_table}
+        sentinel_coordinates = np.inf
+        self._padded_x = np.append(self._points[:, 0], sentinel_coordinates)
+        self._padded_y = np.append(self._points[:, 1], sentinel_coordinates)
+
+        # Centroids ordered by projected x, for the strip search of radius queries
+        self._x_order = np.argsort(self._points[:, 0], kind="stable")
+        self._x_sorted = self._points[self._x_order, 0]
+
+    def _candidate_lists(self, k):
+        """Per-cell candidates for the ``k`` nearest centroids of any point in the cell.
+
+        Centroid j is a candidate for a cell when its minimum distance to the
+        cell is no larger than the k-th smallest maximum distance of any
+        centroid to the cell: k centroids are then at least as close
+        everywhere in the cell, so any other centroid can never be among the
+        k nearest.  For k=1 this is "beaten everywhere by the closest".
+
+        Returns CSR offsets and ids, plus a padded (cells x max candidates)
+        table whose padding points at a sentinel centroid at infinity, so
+        padded slots never win.
+        """
+        nx, ny = self._shape
+        cell_x, cell_y = np.meshgrid(np.arange(nx), np.arange(ny), indexing="ij")
+        cell_low = self._low + np.column_stack([cell_x.ravel(), cell_y.ravel()]) * self._cell_size
+        cell_high = cell_low + self._cell_size
+
+        candidate_lists = []
+        for start in range(0, len(cell_low), BUILD_BLOCK_SIZE):
+            low = cell_low[start:start + BUILD_BLOCK_SIZE, None, :]
+            high = cell_high[start:start + BUILD_BLOCK_SIZE, None, :]
+            points = self._points[None, :, :]
+
+            # Nearest point of the cell to each centroid, and the farthest cell corner
+            nearest_gap = np.maximum(np.maximum(low - points, points - high), 0.0)
+            farthest_gap = np.maximum(np.abs(points - low), np.abs(points - high))
+            min_dist = (nearest_gap ** 2).sum(axis=2)
+            max_dist = (farthest_gap ** 2).sum(axis=2)
+
+            bound = np.partition(max_dist, k - 1, axis=1)[:, k - 1:k]
+            is_candidate = min_dist <= bound
+            candidate_lists.extend(np.flatnonzero(row) for row in is_candidate)
+
+        counts = np.array([len(candidates) for candidates in candidate_lists])
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        ids = np.concatenate(candidate_lists)
+        sentinel = len(self._points)
+        table = np.full((len(candidate_lists), counts.max()), sentinel, dtype=np.int64)
+        for cell, candidates in enumerate(candidate_lists):
+            table[cell, :len(candidates)] = candidates
+        return offsets, ids, table
+
+    def _knn_table(self, k):
+        # Widened candidate tables are built on first use and kept per k
+        if k not in self._knn_tables:
+            self._knn_tables[k] = self._candidate_lists(k)[2]
+        return self._knn_tables[k]
+
+    def _nearest_brute_force(self, xy):
+        dx = xy[:, 0, None] - self._points[None, :, 0]
+        dy = xy[:, 1, None] - self._points[None, :, 1]
+        d2 = dx * dx + dy * dy
+        nearest = d2.argmin(axis=1)
+        return nearest, d2[np.arange(len(xy)), nearest]
+
+    def _nearest_block(self, xy):
+        cell_xy = np.floor((xy - self._low) / self._cell_size).astype(np.int64)
+        inside = np.all((cell_xy >= 0) & (cell_xy < self._shape), axis=1)
+
+        nearest = np.empty(len(xy), dtype=np.int64)
+        d2 = np.empty(len(xy), dtype=np.float64)
+
+        if inside.any():
+            cells = cell_xy[inside, 0] * self._shape[1] + cell_xy[inside, 1]
+            candidates = self._candidate_table[cells]
+            dx = xy[inside, 0, None] - self._padded_x[candidates]
+            dy = xy[inside, 1, None] - self._padded_y[candidates]
+            candidate_d2 = dx * dx + dy * dy
+            best = candidate_d2.argmin(axis=1)
+            rows = np.arange(len(cells))
+            nearest[inside] = candidates[rows, best]
+            d2[inside] = candidate_d2[rows, best]
+
+        # Points outside the grid (far from every centroid) are rare; compare them against all centroids
+        outside = ~inside
+        if outside.any():
+            nearest[outside], d2[outside] = self._nearest_brute_force(xy[outside])
+
+        return nearest, d2
+
+    def lookup(self, lat, lon, max_distance_km=None):
+        """Return ``(positions, distances_km)`` of the nearest centroid for each point.
+
+        ``positions`` index into ``self.names``.  Points farther than
+        ``max_distance_km`` from every centroid, or with a NaN coordinate,
+        get position -1 and a NaN distance.
+        """
+        xy = self._projected(lat, lon)
+
+        positions = np.full(len(xy), -1, dtype=np.int64)
+        distances_km = np.full(len(xy), np.nan)
+        valid = np.flatnonzero(~np.isnan(xy).any(axis=1))
+
+        for start in range(0, len(valid), LOOKUP_BLOCK_SIZE):
+            rows = valid[start:start + LOOKUP_BLOCK_SIZE]
+            nearest, d2 = self._nearest_block(xy[rows])
+            positions[rows] = nearest
+            distances_km[rows] = np.sqrt(d2) * KM_PER_DEGREE
+
+        if max_distance_km is not None:
+            too_far = distances_km > max_distance_km
+            positions[too_far] = -1
+            distances_km[too_far] = np.nan
+
+        return positions, distances_km
+
+    def lookup_names(self, lat, lon, max_distance_km=None):
+        """Like :meth:`lookup` but returns neighborhood names (``None`` when unmatched)."""
+        positions, _ = self.lookup(lat, lon, max_distance_km)
+        names = np.empty(len(positions), dtype=object)
+        matched = positions >= 0
+        names[matched] = self.names[positions[matched]]
+        return names
+
+    def _knn_block(self, xy, k):
+        cell_xy = np.floor((xy - self._low) / self._cell_size).astype(np.int64)
+        inside = np.all((cell_xy >= 0) & (cell_xy < self._shape), axis=1)
+
+        positions = np.empty((len(xy), k), dtype=np.int64)
+        d2 = np.empty((len(xy), k), dtype=np.float64)
+
+        def k_smallest(candidates, candidate_d2):
+            # Candidate rows hold ascending ids, so a stable sort breaks distance ties by id like lookup()
+            order = np.argsort(candidate_d2, axis=1, kind="stable")[:, :k]
+            return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(candidate_d2, order, axis=1)
+
+        if inside.any():
+            cells = cell_xy[inside, 0] * self._shape[1] + cell_xy[inside, 1]
+            candidates = self._knn_table(k)[cells]
+            dx = xy[inside, 0, None] - self._padded_x[candidates]
+            dy = xy[inside, 1, None] - self._padded_y[candidates]
+            positions[inside], d2[inside] = k_smallest(candidates, dx * dx + dy * dy)
+
+        # Points outside the grid are compared against every centroid
+        outside = ~inside
+        if outside.any():
+            candidates = np.broadcast_to(np.arange(len(self._points)), (int(outside.sum()), len(self._points)))
+            dx = xy[outside, 0, None] - self._points[None, :, 0]
+            dy = xy[outside, 1, None] - self._points[None, :, 1]
+            positions[outside], d2[outside] = k_smallest(candidates, dx * dx + dy * dy)
+
+        return positions, d2
+
+    def query_knn(self, lat, lon, k):
+        """Return ``(positions, distances_km)``, each (points x k), of the ``k`` nearest centroids.
+
+        Columns are ordered nearest first.  ``k`` is capped at the number of
+        centroids.  Rows of points with a NaN coordinate hold -1 and NaN.
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        k = min(k, len(self._points))
+        xy = self._projected(lat, lon)
+
+        positions = np.full((len(xy), k), -1, dtype=np.int64)
+        distances_km = np.full((len(xy), k), np.nan)
+        valid = np.flatnonzero(~np.isnan(xy).any(axis=1))
+
+        # Blocks shrink with k so the (points x candidates) temporaries stay bounded
+        block_size = max(1, LOOKUP_BLOCK_SIZE // k)
+        for start in range(0, len(valid), block_size):
+            rows = valid[start:start + block_size]
+            nearest, d2 = self._knn_block(xy[rows], k)
+            positions[rows] = nearest
+            distances_km[rows] = np.sqrt(d2) * KM_PER_DEGREE
+
+        return positions, distances_km
+
+    def query_radius(self, lat, lon, radius_km):
+        """All centroids within ``radius_km`` of each point, in CSR form.
+
+        Returns ``(offsets, ids, distances_km)``: the matches of point i are
+        ``ids[offsets[i]:offsets[i + 1]]`` (positions into ``self.names``),
+        nearest first, like ``candidate_offsets``/``candidate_ids``.  Points
+        with a NaN coordinate have no matches.
+
+        Centroids are kept sorted by projected x, so each point only measures
+        the centroids in the vertical strip ``[x - r, x + r]`` found by binary
+        search.
+        """
+        xy = self._projected(lat, lon)
+        radius = radius_km / KM_PER_DEGREE
+
+        valid = ~np.isnan(xy).any(axis=1)
+        start = np.searchsorted(self._x_sorted, np.where(valid, xy[:, 0] - radius, np.inf), side="left")
+        stop = np.searchsorted(self._x_sorted, np.where(valid, xy[:, 0] + radius, -np.inf), side="right")
+        stop = np.maximum(stop, start)
+
+        point_parts, id_parts, d2_parts = [], [], []
+        strip_counts = stop - start
+        cumulative = np.cumsum(strip_counts)
+        point = 0
+        while point < len(xy):
+            # Blocks of points whose strips hold about LOOKUP_BLOCK_SIZE pairs in total
+            done = cumulative[point - 1] if point else 0
+            end = max(point + 1, int(np.searchsorted(cumulative, done + LOOKUP_BLOCK_SIZE, side="right")))
+            counts = strip_counts[point:end]
+            pair_point = np.repeat(np.arange(point, end), counts)
+            # Position within each strip: a running index reset at every point
+            pair_offset = np.arange(len(pair_point)) - np.repeat(np.cumsum(counts) - counts, counts)
+            pair_id = self._x_order[start[pair_point] + pair_offset]
+            dx = xy[pair_point, 0] - self._points[pair_id, 0]
+            dy = xy[pair_point, 1] - self._points[pair_id, 1]
+            pair_d2 = dx * dx + dy * dy
+            within = pair_d2 <= radius * radius
+            point_parts.append(pair_point[within])
+            id_parts.append(pair_id[within])
+            d2_parts.append(pair_d2[within])
+            point = end
+
+        pair_point = np.concatenate(point_parts) if point_parts else np.empty(0, dtype=np.int64)
+        pair_id = np.concatenate(id_parts) if id_parts else np.empty(0, dtype=np.int64)
+        pair_d2 = np.concatenate(d2_parts) if d2_parts else np.empty(0)
+
+        order = np.lexsort((pair_id, pair_d2, pair_point))
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(pair_point, minlength=len(xy)))])
+        return offsets, pair_id[order], np.sqrt(pair_d2[order]) * KM_PER_DEGREE
@@ -0,0 +1,69 @@
+"""Out-of-core ingestion of census files larger than memory.
+
+Instead of ``read_csv`` + ``dropna`` on the whole file, the CSV is read in
+bounded chunks.  Each chunk is audited for NaNs, cleaned and folded into an
+:class:`~sfo_housing.cube.AggregationCube`, then discarded, so peak memory
+depends on the chunk size and the number of (neighborhood, year) cells, not on
+the size of the input.
+"""
+
+from collections import namedtuple
+
+from sfo_housing.column_stats import ColumnStatsCollector
+from sfo_housing.cube import AggregationCube
+from sfo_housing.loader import CENSUS_DATA_PATH, METRIC_COLUMNS, read_census_csv
+from sfo_housing.neighborhoods import NeighborhoodDictionary
+
+# Rows per chunk; ~100k rows of census columns is a few MB
+DEFAULT_CHUNKSIZE = 100_000
+
+# Result of a streaming ingest
+#   - cube: aggregates of the cleaned rows (same values as the in-memory pipeline)
+#   - nan_entries: total NaN cells seen, i.e. isna().sum().sum() of the raw file
+#   - rows_read / rows_kept: row counts before / after dropna
+#   - stats: column and per-group statistics of the file (see sfo_housing.column_stats)
+StreamingIngestResult = namedtuple(
+    "StreamingIngestResult", ["cube", "nan_entries", "rows_read", "rows_kept", "stats"]
+)
+
+
+def iter_census_chunks(path=CENSUS_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield the census CSV as typed DataFrames of at most ``chunksize`` rows."""
+    with read_census_csv(path, chunksize=chunksize) as reader:
+        yield from reader
+
+
+def ingest_chunks(chunks, metrics=METRIC_COLUMNS):
+    """Fold an iterable of census frames (or record batches) into a cube.
+
+    ``chunks`` may yield pandas DataFrames or anything with a ``to_pandas()``
+    method, such as pyarrow record batches.  NaN rows are dropped per chunk,
+    exactly as ``dropna()`` would drop them from the full frame.  The NaN audit
+    and row counts come from the statistics collected on the same pass.
+    """
+    cube = None
+    collector = ColumnStatsCollector()
+    # One dictionary for every chunk, so a neighborhood keeps one label across chunks
+    dictionary = NeighborhoodDictionary()
+
+    for chunk in chunks:
+        if hasattr(chunk, "to_pandas"):
+            chunk = chunk.to_pandas()
+
+        rows_with_nulls = collector.rows_with_nulls
+        collector.update(chunk)
+        if collector.rows_with_nulls > rows_with_nulls:
+            chunk = chunk.dropna()
+        if chunk.empty:
+            continue
+
+        chunk_cube = AggregationCube.from_frame(chunk, metrics, dictionary)
+        cube = chunk_cube if cube is None else cube.merge(chunk_cube)
+
+    stats = collector.result()
+    return StreamingIngestResult(cube, stats.nan_entries, stats.rows, stats.complete_rows, stats)
+
+
+def ingest_census_file(path=CENSUS_DATA_PATH, chunksize=DEFAULT_CHUNKSIZE, metrics=METRIC_COLUMNS):
+    """Stream a census CSV from disk into a cube with bounded memory."""
+    return ingest_chunks(iter_census_chunks(path, chunksize), metrics)
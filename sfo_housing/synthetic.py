@@ -0,0 +1,91 @@
+"""Synthetic census data at any multiple of the sample size.
+
+Used by the benchmarks to see how each pipeline stage scales.  The generated
+rows have the same columns and shape as ``sfo_neighborhoods_census_data.csv``:
+per-neighborhood prices, year-level ``housing_units``/``gross_rent`` shared by
+every row of a year, and a small fraction of NaN prices.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Row count of the sample extract (sfo_neighborhoods_census_data.csv)
+SAMPLE_ROWS = 397
+SAMPLE_NEIGHBORHOODS = 73
+SAMPLE_YEARS = np.arange(2010, 2017)
+
+# Same NaN rate as the sample (5 of 397 prices are missing)
+NAN_FRACTION = 5 / 397
+
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+
+def synthetic_shape(scale):
+    """``(rows, neighborhoods)`` for a given scale.
+
+    Rows grow linearly with ``scale``; neighborhoods (tracts) grow with its
+    square root, so larger extracts have both more areas and more rows per area.
+    """
+    rows = int(SAMPLE_ROWS * scale)
+    neighborhoods = int(SAMPLE_NEIGHBORHOODS * np.ceil(np.sqrt(scale)))
+    return rows, neighborhoods
+
+
+def neighborhood_names(count):
+    """Synthetic neighborhood labels ``Tract 000001`` ... (fixed width so they sort naturally)."""
+    return [f"Tract {index:06d}" for index in range(count)]
+
+
+def generate_census_chunks(scale=1, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yield synthetic census rows in DataFrames of at most ``chunk_rows`` rows."""
+    rng = np.random.default_rng(seed)
+    rows, n_neighborhoods = synthetic_shape(scale)
+    names = np.asarray(neighborhood_names(n_neighborhoods), dtype=object)
+
+    # Per-neighborhood base price and per-year city-wide facts
+    base_price = rng.lognormal(mean=np.log(400), sigma=0.4, size=n_neighborhoods)
+    housing_units = 372560 + 1947 * np.arange(len(SAMPLE_YEARS))
+    gross_rent = np.array([1239, 1530, 2324, 2971, 3528, 3739, 4390])
+
+    for start in range(0, rows, chunk_rows):
+        size = min(chunk_rows, rows - start)
+        year_idx = rng.integers(0, len(SAMPLE_YEARS), size)
+        neighborhood_idx = rng.integers(0, n_neighborhoods, size)
+        price = base_price[neighborhood_idx] * (1.05 ** year_idx) * rng.lognormal(0.0, 0.25, size)
+        price[rng.random(size) < NAN_FRACTION] = np.nan
+
+        yield pd.DataFrame(
+            {
+                "year": SAMPLE_YEARS[year_idx],
+                "neighborhood": names[neighborhood_idx],
+                "sale_price_sqr_foot": price,
+                "housing_units": housing_units[year_idx],
+                "gross_rent": gross_rent[year_idx],
+            }
+        )
+
+
+def generate_census_data(scale=1, seed=0):
+    """All synthetic rows for ``scale`` as one DataFrame (only for scales that fit in memory)."""
+    return pd.concat(generate_census_chunks(scale, seed), ignore_index=True)
+
+
+def generate_coordinates(scale=1, seed=0):
+    """Synthetic ``Neighborhood, Lat, Lon`` centroids scattered over San Francisco."""
+    rng = np.random.default_rng(seed + 1)
+    _, n_neighborhoods = synthetic_shape(scale)
+    return pd.DataFrame(
+        {
+            "Neighborhood": neighborhood_names(n_neighborhoods),
+            "Lat": rng.uniform(37.70, 37.81, n_neighborhoods),
+            "Lon": rng.uniform(-122.51, -122.37, n_neighborhoods),
+        }
+    )
+
+
+def write_census_csv(path, scale=1, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write synthetic census rows to ``path`` chunk by chunk (works for scales larger than RAM)."""
+    for position, chunk in enumerate(generate_census_chunks(scale, seed, chunk_rows)):
+        chunk.to_csv(path, mode="w" if position == 0 else "a", header=position == 0, index=False)
+    return path
+
@@ -0,0 +1,28 @@
+"""Shared fixtures: the sample census extract and coordinates in Resources/."""
+
+from pathlib import Path
+
+import pytest
+
+from sfo_housing.loader import load_census_data, load_neighborhood_coordinates
+
+RESOURCES = Path(__file__).resolve().parent.parent / "Resources"
+CENSUS_PATH = RESOURCES / "sfo_neighborhoods_census_data.csv"
+COORDINATES_PATH = RESOURCES / "neighborhoods_coordinates.csv"
+
+
+@pytest.fixture(scope="session")
+def raw_census_df():
+    """The census rows as loaded, NaNs included (parsed from the CSV, no snapshot cache)."""
+    return load_census_data(CENSUS_PATH, use_cache=False)
+
+
+@pytest.fixture(scope="session")
+def census_df(raw_census_df):
+    """The census rows after the notebook's ``dropna``."""
+    return raw_census_df.dropna()
+
+
+@pytest.fixture(scope="session")
+def coordinates_df():
+    return load_neighborhood_coordinates(COORDINATES_PATH)
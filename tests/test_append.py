@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sfo_housing.cube import AggregationCube, append_census_rows
+
+
+def _assert_same_cube(actual, expected):
+    assert list(actual.neighborhoods) == list(expected.neighborhoods)
+    assert list(actual.years) == list(expected.years)
+    np.testing.assert_allclose(actual.sums, expected.sums)
+    np.testing.assert_array_equal(actual.counts, expected.counts)
+    np.testing.assert_array_equal(actual.rows, expected.rows)
+
+
+def test_append_matches_full_recompute(census_df, tmp_path):
+    state_path = tmp_path / "cube.npz"
+    for year in sorted(census_df["year"].unique()):
+        cube = append_census_rows(state_path, census_df[census_df["year"] == year])
+
+    full = AggregationCube.from_frame(census_df)
+    _assert_same_cube(cube, full)
+    _assert_same_cube(AggregationCube.load(state_path), full)
+    pd.testing.assert_frame_equal(cube.neighborhood_year_mean(), full.neighborhood_year_mean())
+
+
+def test_append_rejects_years_already_in_the_cube(census_df, tmp_path):
+    state_path = tmp_path / "cube.npz"
+    append_census_rows(state_path, census_df)
+    before = AggregationCube.load(state_path)
+
+    with pytest.raises(ValueError, match="2016"):
+        append_census_rows(state_path, census_df[census_df["year"] == 2016])
+    _assert_same_cube(AggregationCube.load(state_path), before)
+
+
+def test_replace_years_matches_recompute(census_df, tmp_path):
+    state_path = tmp_path / "cube.npz"
+    append_census_rows(state_path, census_df)
+
+    revised = census_df[census_df["year"] == 2016].copy()
+    revised["gross_rent"] += 100
+    cube = append_census_rows(state_path, revised, replace_years=True)
+
+    expected = AggregationCube.from_frame(pd.concat([census_df[census_df["year"] != 2016], revised]))
+    _assert_same_cube(cube, expected)
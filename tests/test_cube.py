@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sfo_housing.cube import AggregationCube
+from sfo_housing.loader import METRIC_COLUMNS
+
+
+@pytest.fixture(scope="module")
+def cube(census_df):
+    return AggregationCube.from_frame(census_df)
+
+
+def _groupby_mean(census_df, keys):
+    # The notebook's float32 columns, averaged in float64 like the cube
+    metrics_df = census_df.astype({metric: np.float64 for metric in METRIC_COLUMNS})
+    # The cube keys cells by the tidied neighborhood label ("Bernal Heights " -> "Bernal Heights")
+    metrics_df["neighborhood"] = metrics_df["neighborhood"].astype(str).str.split().str.join(" ")
+    return metrics_df.groupby(keys, observed=True)[METRIC_COLUMNS].mean()
+
+
+def test_year_mean_matches_groupby(cube, census_df):
+    expected = _groupby_mean(census_df, "year")
+    pd.testing.assert_frame_equal(cube.year_mean(), expected, check_index_type=False, check_names=False)
+
+
+def test_neighborhood_mean_matches_groupby(cube, census_df):
+    expected = _groupby_mean(census_df, "neighborhood")
+    actual = cube.neighborhood_mean()
+    np.testing.assert_array_equal(actual.index.astype(str), expected.index.astype(str))
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy())
+
+
+def test_neighborhood_year_mean_matches_groupby(cube, census_df):
+    expected = _groupby_mean(census_df, ["neighborhood", "year"])
+    actual = cube.neighborhood_year_mean()
+    assert list(actual.index.map(lambda key: (str(key[0]), int(key[1])))) == list(
+        expected.index.map(lambda key: (str(key[0]), int(key[1])))
+    )
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy())
+
+
+def test_metric_subset_and_overall_mean(cube, census_df):
+    np.testing.assert_allclose(
+        cube.year_mean(["gross_rent"])["gross_rent"].to_numpy(),
+        _groupby_mean(census_df, "year")["gross_rent"].to_numpy(),
+    )
+    np.testing.assert_allclose(
+        cube.overall_mean().to_numpy(), census_df[METRIC_COLUMNS].astype(np.float64).mean().to_numpy()
+    )
+
+
+def test_nan_values_are_skipped_like_mean(raw_census_df):
+    # Without dropna the NaN sale prices must not count towards their cell
+    cube = AggregationCube.from_frame(raw_census_df)
+    expected = _groupby_mean(raw_census_df, "year")
+    np.testing.assert_allclose(cube.year_mean().to_numpy(), expected.to_numpy())
+
+
+def test_spelling_variants_share_one_cell(census_df):
+    rows = census_df[census_df["neighborhood"] == "Downtown "].astype({"neighborhood": str})
+    variants = pd.concat([rows, rows.assign(neighborhood="downtown")], ignore_index=True)
+    cube = AggregationCube.from_frame(variants)
+    assert list(cube.neighborhoods) == ["Downtown"]
+    assert cube.rows.sum() == 2 * len(rows)
+
+    # Appending another spelling folds into the existing label
+    appended = cube.without_years(cube.years).append(rows.assign(neighborhood="Downtown"))
+    assert list(appended.neighborhoods) == ["Downtown"]
@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sfo_housing.geo_aggregate import GEO_METRICS, PointPyramid
+
+
+@pytest.mark.parametrize("lon, lat", [([], []), ([np.nan, -122.4], [37.7, np.nan])])
+def test_pyramid_without_located_points_is_empty(lon, lat):
+    listings_df = pd.DataFrame({"Lon": lon, "Lat": lat, **{metric: np.ones(len(lon)) for metric in GEO_METRICS}})
+    pyramid = PointPyramid.from_frame(listings_df, max_level=4)
+
+    kind, points_df = pyramid.view()
+    assert kind == "points" and points_df.empty
+    _, _, counts, means = pyramid.aggregate((0.0, 1.0), (0.0, 1.0))
+    assert counts.sum() == 0 and set(means) == set(GEO_METRICS)
+
+
+def test_aggregate_means_match_points(coordinates_df):
+    rng = np.random.default_rng(13)
+    listings_df = coordinates_df.reset_index(drop=True).assign(
+        gross_rent=rng.uniform(1000, 4000, len(coordinates_df)),
+        sale_price_sqr_foot=rng.uniform(200, 900, len(coordinates_df)),
+    )
+    pyramid = PointPyramid.from_frame(listings_df, max_level=4)
+
+    # Level 0 is one cell over the whole extent: the overall count and means
+    x_range = (pyramid.x0, pyramid.x0 + pyramid.size)
+    y_range = (pyramid.y0, pyramid.y0 + pyramid.size)
+    _, _, counts, means = pyramid.aggregate(x_range, y_range, view_cells=1)
+    assert counts.sum() == len(listings_df)
+    for metric in GEO_METRICS:
+        np.testing.assert_allclose(means[metric].ravel(), [listings_df[metric].mean()])
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sfo_housing.analysis import neighborhood_rollups
+from sfo_housing.cube import AggregationCube
+from sfo_housing.metric_index import MetricIndex, YearScopedIndex
+
+METRICS = ["sale_price_sqr_foot", "gross_rent"]
+
+
+@pytest.fixture(scope="module")
+def prices_by_year_by_neighborhood(census_df):
+    return neighborhood_rollups(AggregationCube.from_frame(census_df))[0]
+
+
+def _assert_same_index(actual, expected):
+    pd.testing.assert_frame_equal(actual.frame, expected.frame)
+    for metric in actual.metrics:
+        np.testing.assert_array_equal(actual._order[metric], expected._order[metric])
+        np.testing.assert_array_equal(actual._sorted[metric], expected._sorted[metric])
+
+
+def test_top_and_bottom_k_match_idxmax(prices_by_year_by_neighborhood):
+    index = MetricIndex(prices_by_year_by_neighborhood, METRICS)
+    for metric in METRICS:
+        column = prices_by_year_by_neighborhood[metric]
+        assert index.top_k(metric).index[0] == column.idxmax()
+        assert index.bottom_k(metric).index[0] == column.idxmin()
+        expected = column.sort_values(ascending=False, kind="stable").head(5)
+        np.testing.assert_array_equal(index.top_k(metric, 5)[metric].to_numpy(), expected.to_numpy())
+
+
+def test_range_query_matches_mask(prices_by_year_by_neighborhood):
+    index = MetricIndex(prices_by_year_by_neighborhood, METRICS)
+    frame = prices_by_year_by_neighborhood
+    bounds = {"sale_price_sqr_foot": (300, 600), "gross_rent": (2000, None)}
+    expected = frame[frame["sale_price_sqr_foot"].between(300, 600) & (frame["gross_rent"] >= 2000)]
+    assert sorted(index.range_query(bounds).index) == sorted(expected.index)
+    assert index.range_count("gross_rent", None, 2000) == int((frame["gross_rent"] <= 2000).sum())
+
+
+def test_update_matches_rebuild(prices_by_year_by_neighborhood):
+    frame = prices_by_year_by_neighborhood.astype(np.float64)
+    rng = np.random.default_rng(3)
+
+    changed = frame.sample(25, random_state=1).copy()
+    changed["sale_price_sqr_foot"] = rng.uniform(100, 900, len(changed))
+    changed.iloc[0, 1] = np.nan
+    new_rows = frame.xs(2016, level="year").head(4)
+    new_rows.index = pd.MultiIndex.from_product([new_rows.index, [2017]], names=["neighborhood", "year"])
+
+    index = MetricIndex(frame, METRICS).update(pd.concat([changed, new_rows]))
+
+    expected_frame = pd.concat([frame, new_rows])
+    expected_frame.loc[changed.index] = changed
+    _assert_same_index(index, MetricIndex(expected_frame, METRICS))
+
+
+def test_year_scoped_update_matches_rebuild(prices_by_year_by_neighborhood):
+    frame = prices_by_year_by_neighborhood.astype(np.float64)
+    changed = frame.xs(2013, level="year", drop_level=False).head(6).copy()
+    changed["gross_rent"] += 500
+
+    index = YearScopedIndex(frame, METRICS).update(changed)
+
+    expected_frame = frame.copy()
+    expected_frame.loc[changed.index] = changed
+    expected = YearScopedIndex(expected_frame, METRICS)
+    _assert_same_index(index.overall, expected.overall)
+    for year in expected.years:
+        _assert_same_index(index.for_year(year), expected.for_year(year))
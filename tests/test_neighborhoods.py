@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+from sfo_housing.cube import AggregationCube
+from sfo_housing.neighborhoods import NeighborhoodDictionary, join_by_id, unmatched_report
+
+
+def test_join_averages_rows_sharing_an_id():
+    coordinates_df = pd.DataFrame(
+        {"Lat": [37.0, 37.2, 37.5], "Lon": [-122.0, -122.2, -122.5]}, index=["Downtown", "downtown", "Noe Valley"]
+    )
+    values_df = pd.DataFrame({"gross_rent": [1000.0, 3000.0, 2000.0]}, index=["Downtown", "Downtown ", "Mission"])
+
+    location_join = join_by_id(NeighborhoodDictionary(), coordinates_df, values_df)
+
+    assert location_join.joined_df["Neighborhood"].tolist() == ["Downtown"]
+    np.testing.assert_allclose(location_join.joined_df[["Lat", "Lon", "gross_rent"]].to_numpy(), [[37.1, -122.1, 2000.0]])
+    assert location_join.missing_coordinates == ["Mission"]
+    assert location_join.missing_census == ["Noe Valley"]
+    assert location_join.duplicate_coordinates == ["Downtown"]
+    assert location_join.duplicate_values == ["Downtown"]
+    assert "several census rows: Downtown" in unmatched_report(location_join)
+
+
+def test_sample_data_joins_without_duplicates(census_df, coordinates_df):
+    dictionary = NeighborhoodDictionary()
+    cube = AggregationCube.from_frame(census_df, dictionary=dictionary)
+    location_join = join_by_id(dictionary, coordinates_df, cube.neighborhood_mean())
+
+    assert "Bernal Heights" in location_join.joined_df["Neighborhood"].tolist()
+    assert location_join.duplicate_coordinates == [] and location_join.duplicate_values == []
@@ -0,0 +1,26 @@
+import json
+
+import pytest
+
+from sfo_housing.analysis import run_analysis
+from sfo_housing.service import QueryIndex, QueryService
+
+from conftest import CENSUS_PATH, COORDINATES_PATH
+
+
+@pytest.fixture(scope="module")
+def service():
+    return QueryService(QueryIndex(run_analysis(CENSUS_PATH, COORDINATES_PATH, use_cache=False)))
+
+
+def test_highest_returns_top_k(service):
+    endpoint, status, body = service.route("/highest/gross_rent?k=2")
+    assert (endpoint, status) == ("highest/gross_rent", 200)
+    assert len(json.loads(body)) == 2
+
+
+@pytest.mark.parametrize("k", ["-5", "0", "two"])
+def test_highest_rejects_invalid_k(service, k):
+    _, status, body = service.route(f"/highest/gross_rent?k={k}")
+    assert status == 400
+    assert "positive integer" in json.loads(body)["error"]
@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sfo_housing.analysis import neighborhood_rollups
+from sfo_housing.cube import AggregationCube
+from sfo_housing.simulator import simulate_neighborhoods
+
+
+@pytest.fixture(scope="module")
+def prices_by_year_by_neighborhood(census_df):
+    return neighborhood_rollups(AggregationCube.from_frame(census_df))[0]
+
+
+@pytest.fixture(scope="module")
+def single_process(prices_by_year_by_neighborhood):
+    return simulate_neighborhoods(prices_by_year_by_neighborhood, paths=500, seed=11, workers=1)
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_results_do_not_depend_on_worker_count(prices_by_year_by_neighborhood, single_process, workers):
+    result = simulate_neighborhoods(prices_by_year_by_neighborhood, paths=500, seed=11, workers=workers)
+    pd.testing.assert_frame_equal(result.params_df, single_process.params_df)
+    np.testing.assert_array_equal(result.returns, single_process.returns)
+    pd.testing.assert_frame_equal(result.summary_df, single_process.summary_df)
+
+
+def test_seed_changes_the_draws(prices_by_year_by_neighborhood, single_process):
+    result = simulate_neighborhoods(prices_by_year_by_neighborhood, paths=500, seed=12, workers=1)
+    assert result.returns.shape == single_process.returns.shape
+    assert not np.array_equal(result.returns, single_process.returns)
+
+
+def test_summary_describes_returns(single_process):
+    summary_df = single_process.summary_df
+    assert list(summary_df.index) == list(single_process.params_df.index)
+    np.testing.assert_allclose(summary_df["mean_return"], single_process.returns.mean(axis=1))
+    np.testing.assert_allclose(summary_df["p50"], np.median(single_process.returns, axis=1))
+    assert summary_df["probability_of_loss"].between(0, 1).all()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from sfo_housing.spatial import KM_PER_DEGREE, NeighborhoodGridIndex
+
+
+@pytest.fixture(scope="module")
+def index(coordinates_df):
+    return NeighborhoodGridIndex(coordinates_df.index, coordinates_df["Lat"], coordinates_df["Lon"])
+
+
+@pytest.fixture(scope="module")
+def points(coordinates_df):
+    # Around the city, plus a margin outside the grid to exercise the brute-force fallback
+    rng = np.random.default_rng(5)
+    lat = rng.uniform(coordinates_df["Lat"].min() - 0.1, coordinates_df["Lat"].max() + 0.1, 20_000)
+    lon = rng.uniform(coordinates_df["Lon"].min() - 0.1, coordinates_df["Lon"].max() + 0.1, 20_000)
+    lat[:3] = np.nan
+    return lat, lon
+
+
+def _brute_force_km(index, lat, lon):
+    # Same projection as the index, every point against every centroid
+    x = lon * index._lon_scale
+    dx = x[:, None] - index._points[None, :, 0]
+    dy = lat[:, None] - index._points[None, :, 1]
+    return np.sqrt(dx * dx + dy * dy) * KM_PER_DEGREE
+
+
+def test_lookup_matches_brute_force(index, points):
+    lat, lon = points
+    distances = _brute_force_km(index, lat, lon)
+    positions, distances_km = index.lookup(lat, lon)
+
+    assert (positions[:3] == -1).all() and np.isnan(distances_km[:3]).all()
+    # Several neighborhoods share a centroid, so compare the distances and the first (lowest) position
+    np.testing.assert_array_equal(positions[3:], distances[3:].argmin(axis=1))
+    np.testing.assert_allclose(distances_km[3:], distances[3:].min(axis=1))
+
+
+def test_lookup_max_distance(index, points):
+    lat, lon = points
+    positions, distances_km = index.lookup(lat, lon, max_distance_km=1.0)
+    nearest = _brute_force_km(index, lat, lon)[3:].min(axis=1)
+    np.testing.assert_array_equal(positions[3:] >= 0, nearest <= 1.0)
+    assert np.nanmax(distances_km) <= 1.0
+
+
+@pytest.mark.parametrize("k", [1, 2, 5, 12, 1000])
+def test_query_knn_matches_brute_force(index, points, k):
+    lat, lon = points
+    distances = _brute_force_km(index, lat, lon)[3:]
+    positions, distances_km = index.query_knn(lat, lon, k)
+
+    k = min(k, len(index.names))
+    assert positions.shape == (len(lat), k)
+    assert (positions[:3] == -1).all()
+    np.testing.assert_array_equal(positions[3:], np.argsort(distances, axis=1, kind="stable")[:, :k])
+    np.testing.assert_allclose(distances_km[3:], np.sort(distances, axis=1)[:, :k])
+
+
+@pytest.mark.parametrize("radius_km", [0.0, 0.5, 2.0, 10.0])
+def test_query_radius_matches_brute_force(index, points, radius_km):
+    lat, lon = points
+    distances = _brute_force_km(index, lat, lon)
+    offsets, ids, distances_km = index.query_radius(lat, lon, radius_km)
+
+    assert len(offsets) == len(lat) + 1
+    assert (np.diff(offsets)[:3] == 0).all()
+    for point in range(3, len(lat), 37):
+        found = ids[offsets[point]:offsets[point + 1]]
+        expected = np.flatnonzero(distances[point] <= radius_km)
+        assert sorted(found) == sorted(expected)
+        found_km = distances_km[offsets[point]:offsets[point + 1]]
+        assert (np.diff(found_km) >= 0).all()
+        np.testing.assert_allclose(found_km, distances[point, found])
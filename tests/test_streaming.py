@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from sfo_housing.analysis import clean
+from sfo_housing.cube import AggregationCube
+from sfo_housing.streaming import ingest_census_file, ingest_chunks
+
+from conftest import CENSUS_PATH
+
+
+@pytest.mark.parametrize("chunksize", [1, 7, 50, 100_000])
+def test_chunked_ingest_matches_in_memory(raw_census_df, chunksize):
+    nan_entries, census_df = clean(raw_census_df)
+    expected = AggregationCube.from_frame(census_df)
+
+    result = ingest_census_file(CENSUS_PATH, chunksize=chunksize)
+
+    assert result.nan_entries == nan_entries
+    assert result.rows_read == len(raw_census_df)
+    assert result.rows_kept == len(census_df)
+    assert list(result.cube.years) == list(expected.years)
+    assert list(result.cube.neighborhoods) == list(expected.neighborhoods)
+    np.testing.assert_allclose(result.cube.sums, expected.sums)
+    np.testing.assert_array_equal(result.cube.counts, expected.counts)
+    np.testing.assert_array_equal(result.cube.rows, expected.rows)
+
+
+def test_ingest_chunks_accepts_frames(raw_census_df):
+    chunks = [raw_census_df.iloc[start:start + 60] for start in range(0, len(raw_census_df), 60)]
+    result = ingest_chunks(chunks)
+    expected = AggregationCube.from_frame(raw_census_df.dropna())
+    np.testing.assert_allclose(result.cube.year_mean().to_numpy(), expected.year_mean().to_numpy())